@@ -1,25 +1,46 @@
 import eventlet
 eventlet.monkey_patch()
+from eventlet import tpool
+import eventlet.event
+import eventlet.semaphore
 
 # Parche para psycopg2 y Eventlet (evita bloqueo en mainloop)
 from psycogreen.eventlet import patch_psycopg
 patch_psycopg()
 
-from flask import Flask, render_template, request
+from flask import Flask, Request, Response, g, jsonify, render_template, request
 from flask_socketio import SocketIO
+from socketio import PubSubManager
 from flask_cors import CORS
+from werkzeug.exceptions import RequestEntityTooLarge
 from flask_mail import Mail, Message
-import sqlite3
 import os
+import json
+import base64
+import hashlib
+import re
+import time
 import psycopg2
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import pytz
 import uuid
 import requests
-from bs4 import BeautifulSoup
-import pandas as pd
+from collections import deque
+from contextlib import contextmanager
+# Pillow se importa recién al usarse (ver generar_thumb)
+
+from correo import ColaCorreoLlena, ServicioCorreo
+from difusion import Difusor
+from hojas import leer_columna
+from metricas import Registro, VigilanteHub
+from migraciones import migrar_postgres, migrar_sqlite
+from mq_local import LocalManager
+from passwords import METODO_POR_DEFECTO, PasswordHasher
+from postgres_pool import PoolTimeout, PostgresPool
+from previews import PreviewCache, PreviewService
+from ranking import Ranking
+from sqlite_store import SQLiteStore, conectar as conectar_sqlite
 
 # --- CONFIG ---
 load_dotenv()
@@ -30,93 +51,206 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = 'anime-radio-secret'
 
 # Configuración de correo (ejemplo con Gmail)
-app.config['MAIL_SERVER'] = 'smtp.gmail.com'
-app.config['MAIL_PORT'] = 465
+app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
+app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', 465))
 app.config['MAIL_USERNAME'] = os.getenv('EMAIL_USER')
 app.config['MAIL_PASSWORD'] = os.getenv('EMAIL_PASS')
-app.config['MAIL_USE_TLS'] = False
-app.config['MAIL_USE_SSL'] = True
+app.config['MAIL_USE_TLS'] = os.getenv('MAIL_USE_TLS', '0') == '1'
+app.config['MAIL_USE_SSL'] = os.getenv('MAIL_USE_SSL', '1') == '1'
 
 mail = Mail(app)
+
+# Envío de correos: cola acotada + workers con conexión SMTP reutilizada
+correo = ServicioCorreo(
+    app, mail,
+    workers=int(os.getenv('CORREO_WORKERS', 2)),
+    cola_max=int(os.getenv('CORREO_COLA_MAX', 200)),
+    por_minuto=int(os.getenv('CORREO_POR_MINUTO', 20)),  # Gmail: ~500/día por cuenta
+    rafaga=int(os.getenv('CORREO_RAFAGA', 5)),
+    reintentos=int(os.getenv('CORREO_REINTENTOS', 4)),
+    timeout=float(os.getenv('CORREO_TIMEOUT', 30)),  # segundos por conexión/envío SMTP
+)
 CORS(app)
 
+# Varios workers/hosts: los emits viajan por una cola de mensajes
+# (redis://, amqp://, kafka://, zmq+tcp:// o local://host:puerto con mq_local.py)
+SOCKETIO_MESSAGE_QUEUE = os.getenv("SOCKETIO_MESSAGE_QUEUE")
+SOCKETIO_CHANNEL = os.getenv("SOCKETIO_CHANNEL", "radio-bonsai")
+# El long-polling necesita sesiones pegajosas (ip_hash en nginx, etc.). Si el
+# balanceador no las tiene, o con `gunicorn -w N`, se usa solo websocket.
+SOCKETIO_SOLO_WEBSOCKET = os.getenv("SOCKETIO_SOLO_WEBSOCKET", "0") == "1"
+
+opciones_socketio = {}
+if SOCKETIO_MESSAGE_QUEUE:
+    if SOCKETIO_MESSAGE_QUEUE.startswith("local://"):
+        opciones_socketio["client_manager"] = LocalManager(SOCKETIO_MESSAGE_QUEUE, channel=SOCKETIO_CHANNEL)
+    else:
+        opciones_socketio["message_queue"] = SOCKETIO_MESSAGE_QUEUE
+        opciones_socketio["channel"] = SOCKETIO_CHANNEL
+if SOCKETIO_SOLO_WEBSOCKET:
+    opciones_socketio["transports"] = ["websocket"]
+
 socketio = SocketIO(
     app,
     cors_allowed_origins="*",
     async_mode='eventlet',
-    logger=True,
+    logger=os.getenv("SOCKETIO_LOGGER", "1") == "1",  # loguea cada emit: en producción alcanza con /metrics
     engineio_logger=False,
     ping_timeout=60,
-    ping_interval=25
+    ping_interval=25,
+    **opciones_socketio
 )
 
 # ✅ FIX: asegurar carpeta de uploads
-os.makedirs("static/uploads", exist_ok=True)
+UPLOADS_DIR = "static/uploads"
+os.makedirs(UPLOADS_DIR, exist_ok=True)
+
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", 8 * 1024 * 1024))
+# margen para el resto de los campos del formulario
+app.config['MAX_CONTENT_LENGTH'] = UPLOAD_MAX_BYTES + 64 * 1024
+
+# --- MÉTRICAS ---
+# Todo queda en memoria y se expone en /metrics (formato Prometheus). Medir
+# cuesta unos microsegundos por observación, así que queda siempre activo.
+HUB_BLOQUEO_UMBRAL = float(os.getenv("HUB_BLOQUEO_UMBRAL", 0.1))  # segundos sin que el hub responda
+
+metricas = Registro()
+m_requests = metricas.histograma(
+    "radio_http_request_segundos", "Duración de los requests por ruta", ("ruta", "metodo", "estado"))
+m_db = metricas.histograma(
+    "radio_db_consulta_segundos", "Duración de cada sentencia SQL", ("base", "operacion"))
+m_db_espera = metricas.histograma(
+    "radio_db_espera_segundos", "Espera por una conexión (o por el commit del lote en SQLite)", ("base",))
+m_http_saliente = metricas.histograma(
+    "radio_http_saliente_segundos", "Duración de las llamadas HTTP salientes", ("destino",))
+m_http_saliente_errores = metricas.contador(
+    "radio_http_saliente_errores_total", "Llamadas HTTP salientes fallidas", ("destino",))
+m_render = metricas.histograma(
+    "radio_render_segundos", "Tiempo de render de plantillas", ("plantilla",))
+m_emit = metricas.histograma(
+    "radio_socketio_emit_segundos", "Tiempo de cada emit a todos los clientes (fan-out)", ("evento",))
+metricas.medidor(
+    "radio_socketio_clientes", "Clientes Socket.IO conectados a este worker",
+    funcion=lambda: len(socketio.server.eio.sockets))
+
+vigilante_hub = VigilanteHub(metricas, umbral=HUB_BLOQUEO_UMBRAL)
+vigilante_hub.iniciar()
+
+
+@contextmanager
+def medir_http(destino):
+    t0 = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        m_http_saliente_errores.inc(destino)
+        raise
+    finally:
+        m_http_saliente.observar(time.perf_counter() - t0, destino)
+
+
+@app.before_request
+def iniciar_medicion():
+    g.t0_request = time.perf_counter()
+
+
+@app.after_request
+def medir_request(response):
+    t0 = g.pop("t0_request", None)
+    if t0 is not None:
+        m_requests.observar(
+            time.perf_counter() - t0, request.endpoint or "sin_ruta", request.method, response.status_code)
+    return response
+
+
+@app.route('/metrics')
+def metrics():
+    return Response(metricas.exponer(), mimetype="text/plain; version=0.0.4")
+
+
+# --- DIFUSIÓN (Socket.IO) ---
+BROADCAST_MODO = os.getenv("BROADCAST_MODO", "lotes")  # "lotes" o "simple" (un emit por evento)
+BROADCAST_VENTANA = float(os.getenv("BROADCAST_VENTANA", 0.1))  # segundos que se junta un lote
+BROADCAST_LOTE_MAX = int(os.getenv("BROADCAST_LOTE_MAX", 50))
+CLIENTE_COLA_MAX = int(os.getenv("CLIENTE_COLA_MAX", 200))  # paquetes pendientes por cliente
+
+difusor = Difusor(
+    socketio, BROADCAST_MODO, BROADCAST_VENTANA, BROADCAST_LOTE_MAX, CLIENTE_COLA_MAX,
+    observar=m_emit.observar,
+)
+
 
 # --- CONEXIONES ---
+PG_POOL_MIN = int(os.getenv("PG_POOL_MIN", 1))
+PG_POOL_MAX = int(os.getenv("PG_POOL_MAX", 10))
+PG_POOL_TIMEOUT = float(os.getenv("PG_POOL_TIMEOUT", 5))  # espera máxima por una conexión
+PG_POOL_MAX_LIFETIME = float(os.getenv("PG_POOL_MAX_LIFETIME", 1800))  # reciclar cada 30 min
+PG_POOL_CHECK_IDLE = float(os.getenv("PG_POOL_CHECK_IDLE", 30))  # validar si estuvo ociosa más de esto
+
+
+pg_pool = PostgresPool(
+    DATABASE_URL, PG_POOL_MIN, PG_POOL_MAX, PG_POOL_TIMEOUT,
+    PG_POOL_MAX_LIFETIME, PG_POOL_CHECK_IDLE,
+    observar=lambda segundos, operacion: m_db.observar(segundos, "postgres", operacion),
+    observar_espera=lambda segundos: m_db_espera.observar(segundos, "postgres"),
+)
+
+metricas.medidor(
+    "radio_postgres_conexiones_en_uso", "Conexiones Postgres prestadas", funcion=lambda: pg_pool.en_uso)
+metricas.medidor(
+    "radio_postgres_esperando", "Greenlets esperando una conexión Postgres", funcion=lambda: pg_pool.esperando)
+
+
 def get_connection():
-    return psycopg2.connect(DATABASE_URL)
+    return pg_pool.connection()
+
+# SQLite: un escritor persistente (group commit) + lectores en pool, en modo WAL
+SQLITE_PATH = os.getenv("SQLITE_PATH", "pedidos.db")
+SQLITE_LECTORES = int(os.getenv("SQLITE_LECTORES", 4))
+SQLITE_LOTE_MAX = int(os.getenv("SQLITE_LOTE_MAX", 64))
+
+sqlite_store = SQLiteStore(
+    SQLITE_PATH, lectores=SQLITE_LECTORES, lote_max=SQLITE_LOTE_MAX,
+    observar=lambda segundos, operacion: m_db.observar(segundos, "sqlite", operacion),
+    observar_espera=lambda segundos, tipo: m_db_espera.observar(segundos, f"sqlite_{tipo}"),
+)
+metricas.medidor(
+    "radio_sqlite_escrituras_pendientes", "Escrituras SQLite esperando al escritor",
+    funcion=lambda: sqlite_store.cola.qsize())
+
 
 def get_sqlite_connection():
-    conn = sqlite3.connect("pedidos.db", check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return conectar_sqlite(SQLITE_PATH)
 
 # --- INIT DB ---
-def init_db():
-    # Postgres
+# Solo aplican migraciones pendientes (ver migraciones.py); en un arranque
+# normal es una consulta por base y no se ejecuta DDL
+def init_postgres():
     with get_connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS usuarios (
-                    id SERIAL PRIMARY KEY,
-                    username TEXT NOT NULL,
-                    email TEXT UNIQUE NOT NULL,
-                    password TEXT NOT NULL,
-                    fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS reset_tokens (
-                    id SERIAL PRIMARY KEY,
-                    user_id INT REFERENCES usuarios(id),
-                    token TEXT UNIQUE NOT NULL,
-                    expiracion TIMESTAMP NOT NULL
-                )
-            """)
-            conn.commit()
+        aplicadas = migrar_postgres(conn)
+    if aplicadas:
+        print("🗃️ Migraciones Postgres aplicadas:", aplicadas)
 
-    # SQLite
-    with get_sqlite_connection() as conn:
-        cur = conn.cursor()
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS pedidos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nombre TEXT NOT NULL,
-                cancion TEXT NOT NULL,
-                dedicatoria TEXT,
-                artista TEXT,
-                fecha_hora TIMESTAMP NOT NULL
-            )
-        """)
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS comentarios (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nombre TEXT NOT NULL,
-                mensaje TEXT NOT NULL,
-                imagen TEXT,
-                fecha_hora TIMESTAMP NOT NULL
-            )
-        """)
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_pedidos_fecha ON pedidos(fecha_hora DESC)")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_comentarios_fecha ON comentarios(fecha_hora DESC)")
 
-        # ✅ FIX: limpieza automática de datos viejos
-        cur.execute("DELETE FROM pedidos WHERE fecha_hora < datetime('now','-7 day')")
-        cur.execute("DELETE FROM comentarios WHERE fecha_hora < datetime('now','-7 day')")
-        conn.commit()
+def init_sqlite():
+    conn = get_sqlite_connection()
+    try:
+        aplicadas = migrar_sqlite(conn)
+    finally:
+        conn.close()
+    if aplicadas:
+        print("🗃️ Migraciones SQLite aplicadas:", aplicadas)
+
+
+def init_db():
+    init_postgres()
+    init_sqlite()
 
-init_db()
+
+@app.cli.command("migrar")
+def migrar():
+    """Aplica las migraciones pendientes de Postgres y SQLite."""
+    init_db()
 
 # --- HORA LOCAL ---
 def obtener_hora_local(fecha_utc, tz_str='America/Guayaquil'):
@@ -124,47 +258,518 @@ def obtener_hora_local(fecha_utc, tz_str='America/Guayaquil'):
     return fecha_utc.astimezone(tz)
 
 
+# --- CACHE DE IMÁGENES (Google Sheets) ---
+SHEET_URL = os.getenv(
+    "SHEET_URL",
+    "https://docs.google.com/spreadsheets/d/e/2PACX-1vTBJwSmSRyJVBX4TvZkTsoxP3W5lszO1mldxvVyJOCKr7bqQeYcCWyPERBxibPWmiTI8lR5knv90y7A/pub?output=xlsx"
+)
+IMAGENES_TTL = int(os.getenv("IMAGENES_TTL", 300))  # segundos entre refrescos
+IMAGENES_CACHE_PATH = os.getenv("IMAGENES_CACHE_PATH", "imagenes_cache.json")
+
+
+def parsear_imagenes(contenido):
+    # la hoja publicada puede ser XLSX (un zip: empieza con "PK") o CSV (output=csv)
+    tipo = "xlsx" if contenido[:2] == b"PK" else "csv"
+    # eliminar comillas extra
+    return [url.strip('"') for url in leer_columna(contenido, "url", tipo)]
+
+
+class ImagenesCache:
+    """Lista de imágenes del carrusel, refrescada en segundo plano.
+
+    Siempre se sirve la última lista buena (stale-while-revalidate); un
+    greenlet la revalida cada `ttl` segundos con peticiones condicionales
+    (ETag / Last-Modified) y la guarda en disco para los arranques en frío.
+    """
+
+    def __init__(self, url, ttl, path):
+        self.url = url
+        self.ttl = ttl
+        self.path = path
+        self.urls = []
+        self.version = 0  # cambia cada vez que cambia la lista
+        self.etag = None
+        self.last_modified = None
+        self.actualizado = None  # monotonic del último refresco; None = nunca (no 0: monotonic cuenta desde el boot)
+        self._refrescador = None
+        self._primera = eventlet.event.Event()  # primera vuelta de _bucle terminada
+        self._cargar_disco()
+
+    def _cargar_disco(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("url") != self.url:
+            return
+        self.urls = data.get("urls", [])
+        self.etag = data.get("etag")
+        self.last_modified = data.get("last_modified")
+
+    def _guardar_disco(self):
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({
+                    "url": self.url, "urls": self.urls,
+                    "etag": self.etag, "last_modified": self.last_modified
+                }, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print("❌ Error guardando cache de imágenes:", e)
+
+    def refrescar(self):
+        headers = {}
+        if self.urls:
+            if self.etag:
+                headers["If-None-Match"] = self.etag
+            if self.last_modified:
+                headers["If-Modified-Since"] = self.last_modified
+        try:
+            with medir_http("sheets"):
+                r = requests.get(self.url, headers=headers, timeout=15)
+                if r.status_code != 304:
+                    r.raise_for_status()
+            if r.status_code == 304:
+                self.actualizado = time.monotonic()
+                return
+            # parsear el XML es CPU puro: se hace en un hilo real para no bloquear el hub
+            urls = tpool.execute(parsear_imagenes, r.content)
+        except Exception as e:
+            # nos quedamos con la última lista buena
+            print("❌ Error cargando imágenes desde Google Sheets:", e)
+            return
+
+        if urls != self.urls:
+            self.urls = urls
+            self.version += 1
+        self.etag = r.headers.get("ETag")
+        self.last_modified = r.headers.get("Last-Modified")
+        self.actualizado = time.monotonic()
+        self._guardar_disco()
+
+    def _bucle(self):
+        while True:
+            if self.actualizado is None or time.monotonic() - self.actualizado >= self.ttl:
+                self.refrescar()
+            if not self._primera.ready():
+                self._primera.send(True)
+            eventlet.sleep(self.ttl)
+
+    def iniciar(self):
+        # se arranca perezosamente, ya dentro del worker (no en el master de gunicorn);
+        # se asigna antes de ceder el hub, así que hay un solo _bucle por proceso
+        if self._refrescador is None:
+            self._refrescador = eventlet.spawn(self._bucle)
+        if not self.urls and not self._primera.ready():
+            # sin copia en disco: los requests del arranque esperan la misma descarga
+            self._primera.wait()
+
+    def obtener(self):
+        self.iniciar()
+        return self.urls
+
+
+imagenes_cache = ImagenesCache(SHEET_URL, IMAGENES_TTL, IMAGENES_CACHE_PATH)
+
+
 def cargar_imagenes():
-    sheet_url = "https://docs.google.com/spreadsheets/d/e/2PACX-1vTBJwSmSRyJVBX4TvZkTsoxP3W5lszO1mldxvVyJOCKr7bqQeYcCWyPERBxibPWmiTI8lR5knv90y7A/pub?output=xlsx"
-    try:
-        df = pd.read_excel(sheet_url)
-        df.columns = df.columns.str.strip()  # limpiar espacios
-        if "url" not in df.columns:
-            raise ValueError(f"Columnas disponibles: {df.columns.tolist()}")
+    return imagenes_cache.obtener()
+
+# --- FEED EN VIVO (memoria) ---
+FEED_LIMITE = int(os.getenv("FEED_LIMITE", 150))
+
+
+class LiveFeed:
+    """Últimos pedidos y comentarios en memoria (más nuevo primero).
+
+    Se precarga desde SQLite y se actualiza en el mismo camino que emite
+    `nuevo_pedido` / `nuevo_comentario`, así que una visita a `/` no toca la
+    base. `version` cambia con cada alta y sirve para invalidar el HTML cacheado.
+    """
+
+    def __init__(self, limite):
+        self.limite = limite
+        self.pedidos = deque(maxlen=limite)
+        self.comentarios = deque(maxlen=limite)
+        self.version = 0
+
+    def cargar(self, store):
+        with store.lectura() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT id, nombre, cancion, dedicatoria, artista, fecha_hora FROM pedidos ORDER BY fecha_hora DESC LIMIT ?",
+                (self.limite,)
+            )
+            pedidos = [dict(r) for r in cur.fetchall()]
+            cur.execute(
+                "SELECT id, nombre, mensaje, imagen, fecha_hora FROM comentarios ORDER BY fecha_hora DESC LIMIT ?",
+                (self.limite,)
+            )
+            comentarios = [dict(r) for r in cur.fetchall()]
+
+        self.pedidos = deque(pedidos, maxlen=self.limite)
+        self.comentarios = deque(comentarios, maxlen=self.limite)
+        self.version += 1
+
+    def cursores(self):
+        # cursor del elemento más nuevo de cada lista (ver /api/pedidos y /api/comentarios)
+        return {
+            nombre: codificar_cursor(lista[0]["fecha_hora"], lista[0]["id"]) if lista else None
+            for nombre, lista in (("pedidos", self.pedidos), ("comentarios", self.comentarios))
+        }
+
+    def agregar_pedido(self, pedido):
+        self.pedidos.appendleft(pedido)
+        self.version += 1
+
+    def agregar_comentario(self, comentario):
+        self.comentarios.appendleft(comentario)
+        self.version += 1
+
+    def recortar(self, nombre, corte):
+        # quita del final (lo más viejo) lo que la retención ya borró de SQLite
+        lista = getattr(self, nombre)
+        quitados = 0
+        while lista and lista[-1]["fecha_hora"] < corte:
+            lista.pop()
+            quitados += 1
+        if quitados:
+            self.version += 1
+
+
+live_feed = LiveFeed(FEED_LIMITE)
+
+
+def espejar_evento(evento, data):
+    # pedidos/comentarios que entraron por otro worker también van al feed local
+    if evento == "lote":
+        for item in data:
+            espejar_evento(item["evento"], item["data"])
+        return
+    if evento not in ("nuevo_pedido", "nuevo_comentario"):
+        return
+    fecha_hora, _ = decodificar_cursor(data["cursor"])
+    if evento == "nuevo_pedido":
+        live_feed.agregar_pedido({
+            'id': data['id'], 'nombre': data['nombre'], 'cancion': data['cancion'],
+            'dedicatoria': data['dedicatoria'], 'artista': data['artista'], 'fecha_hora': fecha_hora
+        })
+        # ranking_horas ya lo actualizó el worker que recibió el pedido
+        ranking.agregar(data['cancion'], data['artista'], datetime.fromisoformat(fecha_hora))
+    else:
+        live_feed.agregar_comentario({
+            'id': data['id'], 'nombre': data['nombre'], 'mensaje': data['mensaje'],
+            'imagen': data['imagen'], 'fecha_hora': fecha_hora
+        })
+
+
+def instalar_espejo(manager):
+    handle_emit = manager._handle_emit
+
+    def _handle_emit(message):
+        if message.get('host_id') != manager.host_id and message.get('room') is None:
+            espejar_evento(message['event'], message['data'])
+        return handle_emit(message)
+
+    manager._handle_emit = _handle_emit
+
+
+if isinstance(socketio.server.manager, PubSubManager):
+    instalar_espejo(socketio.server.manager)
+
+# --- RANKING ---
+# Canciones y artistas más pedidos por ventana móvil. Los conteos por hora
+# se escriben en el mismo lote que el pedido y el top se arma en memoria
+# (ver ranking.py), así que no depende del tamaño del historial.
+RANKING_VENTANAS = {"hora": 1, "dia": 24, "semana": 168}  # nombre -> horas
+RANKING_VENTANA_VIVO = os.getenv("RANKING_VENTANA_VIVO", "semana")  # la que se emite por Socket.IO
+RANKING_TOP = int(os.getenv("RANKING_TOP", 10))
+RANKING_INTERVALO = float(os.getenv("RANKING_INTERVALO", 2))  # segundos mínimos entre emits de `ranking`
+
+ranking = Ranking(RANKING_VENTANAS, RANKING_TOP)
+_ranking_vivo = {"temporizador": None, "ultimo": None}
+
+
+def programar_ranking():
+    # una ráfaga de pedidos produce un solo emit cada RANKING_INTERVALO
+    if _ranking_vivo["temporizador"] is None:
+        _ranking_vivo["temporizador"] = eventlet.spawn_after(RANKING_INTERVALO, emitir_ranking)
+
+
+def emitir_ranking():
+    _ranking_vivo["temporizador"] = None
+    top = ranking.top(RANKING_VENTANA_VIVO)
+    if top == _ranking_vivo["ultimo"]:
+        return  # los pedidos no movieron el top
+    _ranking_vivo["ultimo"] = top
+    difusor.emitir('ranking', {'ventana': RANKING_VENTANA_VIVO, **top})
+
+
+# --- RETENCIÓN ---
+# Días que se guarda cada tabla; la purga corre en segundo plano en lotes
+# chicos para no retener el lock de escritura. En la misma corrida se
+# borran los reset_tokens vencidos de Postgres, como último paso y sin que
+# un error de Postgres corte la purga de SQLite.
+RETENCION_DIAS = {
+    "pedidos": float(os.getenv("RETENCION_PEDIDOS_DIAS", 7)),
+    "comentarios": float(os.getenv("RETENCION_COMENTARIOS_DIAS", 7)),
+}
+# los conteos del ranking ocupan poco: se guardan más que los pedidos
+RETENCION_RANKING_DIAS = float(os.getenv("RETENCION_RANKING_DIAS", 30))
+RETENCION_INTERVALO = int(os.getenv("RETENCION_INTERVALO", 600))  # segundos entre corridas
+RETENCION_LOTE = int(os.getenv("RETENCION_LOTE", 500))  # filas por DELETE
+RETENCION_GRACIA_UPLOADS = int(os.getenv("RETENCION_GRACIA_UPLOADS", 3600))  # no tocar archivos recientes
+
+_ultima_retencion = {}
+
+
+def activar_incremental_vacuum(conn):
+    # auto_vacuum solo cambia con un VACUUM completo; se hace una única vez.
+    # Devuelve si quedó activo (el VACUUM falla si otro proceso tiene la base ocupada)
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+    return conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+
+def incremental_vacuum(conn):
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    libres = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    conn.execute("PRAGMA incremental_vacuum").fetchall()
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return libres * page_size
+
+
+def borrar_en_lotes(sql, corte):
+    """Repite `sql` (un DELETE con `< ?` y `LIMIT ?`) hasta que borre menos de un lote."""
+    borradas = 0
+    while True:
+        n = sqlite_store.ejecutar(sql, (corte, RETENCION_LOTE))
+        borradas += n
+        if n < RETENCION_LOTE:
+            return borradas
+        eventlet.sleep(0)  # deja pasar a los inserts entre lote y lote
+
+
+def purgar_tabla(tabla, corte):
+    return borrar_en_lotes(
+        f"DELETE FROM {tabla} WHERE id IN (SELECT id FROM {tabla} WHERE fecha_hora < ? LIMIT ?)", corte
+    )
+
+
+def purgar_ranking(corte):
+    return borrar_en_lotes(
+        "DELETE FROM ranking_horas WHERE (tipo, clave, hora) IN "
+        "(SELECT tipo, clave, hora FROM ranking_horas WHERE hora < ? LIMIT ?)",
+        corte
+    )
+
+
+def purgar_uploads():
+    # original y miniatura comparten el nombre base (el hash), así que se
+    # compara sin extensión
+    with sqlite_store.lectura() as conn:
+        usados = {
+            os.path.splitext(os.path.basename(r["imagen"]))[0]
+            for r in conn.execute("SELECT imagen FROM comentarios WHERE imagen IS NOT NULL")
+        }
+    archivos = bytes_liberados = 0
+    limite = time.time() - RETENCION_GRACIA_UPLOADS
+    for directorio in (UPLOADS_DIR, THUMBS_DIR):
+        with os.scandir(directorio) as entradas:
+            for entrada in entradas:
+                if not entrada.is_file() or os.path.splitext(entrada.name)[0] in usados:
+                    continue
+                info = entrada.stat()
+                if info.st_mtime > limite:
+                    continue  # puede ser de un comentario que se está guardando
+                try:
+                    os.remove(entrada.path)
+                except OSError:
+                    continue
+                archivos += 1
+                bytes_liberados += info.st_size
+    return archivos, bytes_liberados
+
+
+def purgar_reset_tokens():
+    # usa idx_reset_tokens_expiracion; `expiracion` se guarda en UTC sin zona
+    borradas = 0
+    while True:
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "DELETE FROM reset_tokens WHERE id IN "
+                    "(SELECT id FROM reset_tokens WHERE expiracion < %s LIMIT %s)",
+                    (datetime.utcnow(), RETENCION_LOTE)
+                )
+                n = cur.rowcount
+        borradas += n
+        if n < RETENCION_LOTE:
+            return borradas
+
+
+def ejecutar_retencion():
+    t0 = time.monotonic()
+    reporte = {"filas": {}}
+    for tabla, dias in RETENCION_DIAS.items():
+        corte = (datetime.utcnow() - timedelta(days=dias)).isoformat(' ')
+        reporte["filas"][tabla] = purgar_tabla(tabla, corte)
+        live_feed.recortar(tabla, corte)
+    corte_ranking = int(time.time() - RETENCION_RANKING_DIAS * 86400) // 3600
+    reporte["filas"]["ranking_horas"] = purgar_ranking(corte_ranking)
+    reporte["archivos"], reporte["bytes_uploads"] = purgar_uploads()
+    reporte["bytes_db"] = sqlite_store.mantenimiento(incremental_vacuum)
+    # Postgres va aparte: si está caído o todavía no arrancó, lo de SQLite se purga igual
+    if not arranque.listo["postgres"].ready():
+        reporte["error_reset_tokens"] = "Postgres no está listo"
+    else:
+        try:
+            reporte["filas"]["reset_tokens"] = purgar_reset_tokens()
+        except Exception as e:
+            reporte["error_reset_tokens"] = f"{type(e).__name__}: {e}"
+            print("❌ Error purgando reset_tokens:", reporte["error_reset_tokens"])
+    reporte["duracion_s"] = round(time.monotonic() - t0, 3)
+    reporte["fecha"] = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+    _ultima_retencion.clear()
+    _ultima_retencion.update(reporte)
+    print(
+        f"🧹 Retención: {reporte['filas']} filas, {reporte['archivos']} archivos, "
+        f"{reporte['bytes_uploads'] + reporte['bytes_db']} bytes liberados"
+    )
+    return reporte
+
+
+def bucle_retencion():
+    incremental = False
+    while True:
+        # se reintenta en cada vuelta hasta que quede activo; la purga corre igual
+        if not incremental:
+            try:
+                incremental = sqlite_store.mantenimiento(activar_incremental_vacuum)
+            except Exception as e:
+                print("❌ No se pudo activar auto_vacuum incremental:", e)
+        try:
+            ejecutar_retencion()
+        except Exception as e:
+            print("❌ Error en la retención:", e)
+        eventlet.sleep(RETENCION_INTERVALO)
 
-        # eliminar comillas extra
-        urls = df["url"].dropna().apply(lambda x: str(x).strip('"')).tolist()
-        return urls
 
-    except Exception as e:
-        print("❌ Error cargando imágenes desde Google Sheets:", e)
-        return []
+
+# --- ARRANQUE ---
+# En modo diferido el import no toca las bases: migraciones, pool de Postgres
+# y precarga del feed corren en segundo plano y los requests esperan (como
+# mucho ARRANQUE_ESPERA segundos) solo a la base que usan. El host gratuito
+# duerme y despierta con tráfico, así que el primer oyente no paga el
+# handshake con Postgres. ARRANQUE_DIFERIDO=0 vuelve al arranque sincrónico.
+ARRANQUE_DIFERIDO = os.getenv("ARRANQUE_DIFERIDO", "1") == "1"
+ARRANQUE_ESPERA = float(os.getenv("ARRANQUE_ESPERA", 10))
+ARRANQUE_BACKOFF_MAX = float(os.getenv("ARRANQUE_BACKOFF_MAX", 30))  # reintentos de Postgres
+
+
+class Arranque:
+    """Inicialización de las bases con un evento de "listo" por cada una."""
+
+    def __init__(self, backoff_max):
+        self.backoff_max = backoff_max
+        self.listo = {"sqlite": eventlet.event.Event(), "postgres": eventlet.event.Event()}
+        self.t0 = time.monotonic()
+        self.tiempos = {}
+        self.intentos_postgres = 0
+        self.ultimo_error = None
+
+    def _marcar(self, base):
+        self.tiempos[base] = round(time.monotonic() - self.t0, 3)
+        self.listo[base].send(True)
+
+    def iniciar_sqlite(self):
+        init_sqlite()
+        live_feed.cargar(sqlite_store)
+        ranking.cargar(sqlite_store)
+        self._marcar("sqlite")
+
+    def iniciar_postgres(self, reintentar=True):
+        espera = 1.0
+        while True:
+            self.intentos_postgres += 1
+            try:
+                init_postgres()
+                pg_pool.llenar()
+                break
+            except (psycopg2.Error, PoolTimeout) as e:
+                self.ultimo_error = f"{type(e).__name__}: {e}"
+                if not reintentar:
+                    raise
+                print(f"❌ Postgres no disponible, reintento en {espera:.0f}s:", self.ultimo_error)
+                eventlet.sleep(espera)
+                espera = min(espera * 2, self.backoff_max)
+        self._marcar("postgres")
+
+    def _retencion(self):
+        # solo espera a SQLite; la purga de reset_tokens se saltea mientras
+        # Postgres no esté listo (ver ejecutar_retencion)
+        self.listo["sqlite"].wait()
+        bucle_retencion()
+
+    def iniciar(self, diferido):
+        if diferido:
+            eventlet.spawn(self.iniciar_sqlite)
+            eventlet.spawn(self.iniciar_postgres)
+        else:
+            self.iniciar_sqlite()
+            self.iniciar_postgres(reintentar=False)
+        eventlet.spawn(self._retencion)
+
+    def esperar(self, base, timeout):
+        evento = self.listo[base]
+        if not evento.ready():
+            evento.wait(timeout)
+        return evento.ready()
+
+    def stats(self):
+        return {
+            "diferido": ARRANQUE_DIFERIDO,
+            "listo": {base: evento.ready() for base, evento in self.listo.items()},
+            "segundos": self.tiempos,
+            "intentos_postgres": self.intentos_postgres,
+            "ultimo_error": self.ultimo_error,
+        }
+
+
+arranque = Arranque(ARRANQUE_BACKOFF_MAX)
+arranque.iniciar(ARRANQUE_DIFERIDO)
+
+# endpoints que no tocan ninguna base y los que además necesitan Postgres
+RUTAS_SIN_BASE = {"static", "salud", "stats", "about", "metrics"}
+RUTAS_POSTGRES = {"register", "login", "forgot_password", "reset_password"}
+
+
+@app.before_request
+def esperar_arranque():
+    if request.endpoint is None or request.endpoint in RUTAS_SIN_BASE:
+        return None
+    bases = ["sqlite", "postgres"] if request.endpoint in RUTAS_POSTGRES else ["sqlite"]
+    for base in bases:
+        if not arranque.esperar(base, ARRANQUE_ESPERA):
+            return {"error": "El servidor está iniciando, intenta de nuevo"}, 503, {"Retry-After": "5"}
+    return None
+
+
+@app.route('/salud')
+def salud():
+    listo = all(evento.ready() for evento in arranque.listo.values())
+    return arranque.stats(), 200 if listo else 503
+
+
+_index_cache = {"clave": None, "html": None}
 
 # --- RUTAS ---
 @app.route('/')
 def index():
-    # pedidos y comentarios vienen de SQLite
-    with get_sqlite_connection() as conn:
-        cur = conn.cursor()
-        cur.execute("SELECT nombre, cancion, dedicatoria, artista, fecha_hora FROM pedidos ORDER BY fecha_hora DESC LIMIT 150")
-        pedidos = [
-            {
-                "nombre": r["nombre"],
-                "cancion": r["cancion"],
-                "dedicatoria": r["dedicatoria"],
-                "artista": r["artista"],
-                "fecha_hora": r["fecha_hora"]
-            } for r in cur.fetchall()
-        ]
-
-        cur.execute("SELECT nombre, mensaje, fecha_hora FROM comentarios ORDER BY fecha_hora DESC LIMIT 150")
-        comentarios = [
-            {
-                "nombre": r["nombre"],
-                "mensaje": r["mensaje"],
-                "fecha_hora": r["fecha_hora"]
-            } for r in cur.fetchall()
-        ]
+    # pedidos y comentarios vienen del feed en memoria (precargado desde SQLite)
 
     # # las imágenes siguen igual
     # imagenes = [
@@ -219,13 +824,63 @@ def index():
     # ]
     
    
-    # ✅ ahora cargamos dinámicamente desde Google Sheets
+    # ✅ ahora cargamos dinámicamente desde Google Sheets (cacheado)
     imagenes = cargar_imagenes()
-    
-    return render_template('index.html', pedidos=pedidos, comentarios=comentarios, imagenes=imagenes)
+
+    # antes de armar la clave: top() descuenta las horas que salieron de la ventana
+    top = ranking.top(RANKING_VENTANA_VIVO)
+
+    # el HTML solo se vuelve a renderizar si cambió el feed, las imágenes o el ranking
+    clave = (live_feed.version, imagenes_cache.version, ranking.version)
+    if _index_cache["clave"] != clave:
+        with m_render.medir('index.html'):
+            _index_cache["html"] = render_template(
+                'index.html', pedidos=live_feed.pedidos,
+                comentarios=live_feed.comentarios, imagenes=imagenes,
+                cursores=live_feed.cursores(), solo_websocket=SOCKETIO_SOLO_WEBSOCKET,
+                ranking=top
+            )
+        _index_cache["clave"] = clave
+    return _index_cache["html"]
+
+
+@app.errorhandler(PoolTimeout)
+def pool_agotado(e):
+    return {"error": "Servidor ocupado, intenta de nuevo"}, 503
+
+
+@app.route('/stats')
+def stats():
+    return {
+        "postgres": pg_pool.stats(),
+        "sqlite": sqlite_store.stats(),
+        "difusion": difusor.stats(),
+        "hash": hasher.stats(),
+        "retencion": _ultima_retencion,
+        "correo": correo.stats(),
+        "arranque": arranque.stats(),
+        "hub": vigilante_hub.stats(),
+        "ranking": ranking.stats(),
+    }
 
 
 # --- Registro/Login ---
+# Los hashes corren en hilos reales: un login no congela los demás greenlets
+HASH_CONCURRENCIA = int(os.getenv("HASH_CONCURRENCIA", 2))
+HASH_METODO = os.getenv("HASH_METODO", METODO_POR_DEFECTO)
+
+hasher = PasswordHasher(HASH_CONCURRENCIA, HASH_METODO)
+
+
+def rehash_password(user_id, password):
+    try:
+        nuevo_hash = hasher.generar(password)
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("UPDATE usuarios SET password = %s WHERE id = %s", (nuevo_hash, user_id))
+    except (psycopg2.Error, PoolTimeout) as e:
+        print("❌ Error actualizando hash de contraseña:", e)
+
 @app.route('/register', methods=['POST'])
 def register():
     data = request.get_json()
@@ -238,7 +893,7 @@ def register():
     if not username or not email or not password:
         return {"error": "Faltan campos"}, 400
 
-    hashed_password = generate_password_hash(password)
+    hashed_password = hasher.generar(password)
     try:
         with get_connection() as conn:
             with conn.cursor() as cur:
@@ -262,7 +917,10 @@ def login():
             cur.execute("SELECT id, username, email, password FROM usuarios WHERE username = %s", (username,))
             user = cur.fetchone()
 
-    if user and check_password_hash(user[3], password):
+    if user and hasher.verificar(user[3], password):
+        if hasher.necesita_rehash(user[3]):
+            # parámetros viejos: se actualiza el hash sin demorar la respuesta
+            eventlet.spawn_n(rehash_password, user[0], password)
         return {"message": "Login exitoso", "usuario": {"id": user[0], "username": user[1], "email": user[2]}}, 200
     return {"error": "Credenciales incorrectas"}, 401
 
@@ -271,24 +929,172 @@ ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif", "webp"}
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def extract_link_preview(url):
-    try:
-        r = requests.get(url, timeout=5)
-        soup = BeautifulSoup(r.text, "html.parser")
-        return {
-            "title": soup.find("title").text if soup.find("title") else url,
-            "description": soup.find("meta", attrs={"name": "description"})["content"]
-                if soup.find("meta", attrs={"name": "description"}) else "",
-            "image": soup.find("meta", property="og:image")["content"]
-                if soup.find("meta", property="og:image") else "",
-            "url": url
-        }
-    except Exception:
-        return None
-    
-def send_async_email(msg):
-    with app.app_context():
-        mail.send(msg)
+# --- UPLOADS ---
+# Los archivos se guardan por su sha256: la misma imagen subida dos veces
+# ocupa disco una sola vez. Los clientes reciben una miniatura WebP.
+THUMBS_DIR = os.path.join(UPLOADS_DIR, "thumbs")
+THUMB_LADO_MAX = int(os.getenv("THUMB_LADO_MAX", 640))
+THUMB_CALIDAD = int(os.getenv("THUMB_CALIDAD", 80))
+THUMB_CONCURRENCIA = int(os.getenv("THUMB_CONCURRENCIA", 2))
+# píxeles decodificados como mucho por imagen (~100 MB en RGBA con el valor por defecto)
+THUMB_PIXELES_MAX = int(os.getenv("THUMB_PIXELES_MAX", 25_000_000))
+os.makedirs(THUMBS_DIR, exist_ok=True)
+
+_thumb_sem = eventlet.semaphore.Semaphore(THUMB_CONCURRENCIA)
+_thumbs_en_curso = {}  # destino -> Event: una sola generación por miniatura
+
+
+class UploadEnDisco:
+    """Destino del parser multipart: escribe el archivo directo a disco.
+
+    Werkzeug le va pasando los pedazos del body a medida que llegan; acá se
+    calcula el sha256 y se corta apenas se pasa de UPLOAD_MAX_BYTES, sin
+    haber guardado el archivo entero en memoria ni en otro temporal.
+    """
+
+    def __init__(self):
+        self.path = os.path.join(UPLOADS_DIR, f".tmp-{uuid.uuid4().hex}")
+        self._f = open(self.path, "w+b")
+        self.sha = hashlib.sha256()
+        self.total = 0
+
+    def write(self, data):
+        self.total += len(data)
+        if self.total > UPLOAD_MAX_BYTES:
+            raise RequestEntityTooLarge()
+        self.sha.update(data)
+        return self._f.write(data)
+
+    def __getattr__(self, nombre):
+        return getattr(self._f, nombre)
+
+    def guardar(self, ext):
+        """Mueve el temporal a `<sha256>.<ext>`; si ya existía, lo descarta."""
+        self._f.close()
+        nombre = f"{self.sha.hexdigest()}.{ext}"
+        destino = os.path.join(UPLOADS_DIR, nombre)
+        try:
+            # ya la teníamos: se renueva el mtime para que purgar_uploads no
+            # la borre (ni a su miniatura) si el comentario anterior ya se purgó
+            os.utime(destino)
+        except FileNotFoundError:
+            os.replace(self.path, destino)
+        else:
+            os.remove(self.path)
+            try:
+                os.utime(os.path.join(THUMBS_DIR, f"{self.sha.hexdigest()}.webp"))
+            except FileNotFoundError:
+                pass  # url_thumb la genera
+        return nombre
+
+    def descartar(self):
+        self._f.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class RadioRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        upload = UploadEnDisco()
+        g.setdefault("uploads", []).append(upload)
+        return upload
+
+
+app.request_class = RadioRequest
+
+
+@app.teardown_request
+def limpiar_uploads(exc):
+    # temporales de archivos que no se usaron (extensión inválida, error, ...)
+    for upload in g.pop("uploads", []):
+        upload.descartar()
+
+
+def guardar_upload(file):
+    ext = file.filename.rsplit('.', 1)[1].lower()
+    return file.stream.guardar("jpg" if ext == "jpeg" else ext)
+
+
+def generar_thumb(origen, destino):
+    from PIL import Image, ImageOps
+
+    with Image.open(origen) as img:
+        # JPEG se puede decodificar ya reducido (1/2, 1/4, 1/8): se pide al tamaño de la miniatura
+        if img.format == "JPEG":
+            img.draft("RGB", (THUMB_LADO_MAX, THUMB_LADO_MAX))
+        # el resto se decodifica entero: un PNG chico en bytes puede ocupar cientos de MB
+        ancho, alto = img.size
+        if ancho * alto > THUMB_PIXELES_MAX:
+            raise ValueError(f"imagen demasiado grande para la miniatura ({ancho}x{alto})")
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((THUMB_LADO_MAX, THUMB_LADO_MAX))
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA")
+        tmp = f"{destino}.{uuid.uuid4().hex}.tmp"  # nunca compartido entre llamadas
+        img.save(tmp, "WEBP", quality=THUMB_CALIDAD)
+    os.replace(tmp, destino)
+
+
+def url_thumb(nombre):
+    """Genera (si hace falta) la miniatura y devuelve su URL; si no se puede, la original."""
+    if nombre.endswith(".gif"):
+        return f"/static/uploads/{nombre}"  # se pierde la animación: va la original
+    thumb = f"{nombre.rsplit('.', 1)[0]}.webp"
+    destino = os.path.join(THUMBS_DIR, thumb)
+    if not os.path.exists(destino):
+        try:
+            en_curso = _thumbs_en_curso.get(destino)
+            if en_curso is not None:
+                # la misma imagen subida a la vez (un meme popular): se espera a la primera
+                en_curso.wait()
+            else:
+                en_curso = _thumbs_en_curso[destino] = eventlet.event.Event()
+                try:
+                    # Pillow es CPU puro: en un hilo real, con concurrencia limitada
+                    with _thumb_sem:
+                        tpool.execute(generar_thumb, os.path.join(UPLOADS_DIR, nombre), destino)
+                except Exception as e:
+                    en_curso.send_exception(e)
+                    raise
+                else:
+                    en_curso.send(True)
+                finally:
+                    del _thumbs_en_curso[destino]
+        except Exception as e:
+            print("❌ Error generando miniatura:", e)
+            return f"/static/uploads/{nombre}"
+    return f"/static/uploads/thumbs/{thumb}"
+
+
+@app.errorhandler(413)
+def upload_demasiado_grande(e):
+    return {"error": "La imagen es demasiado grande"}, 413
+
+
+@app.after_request
+def cache_uploads(response):
+    # los nombres de los uploads nunca se reutilizan: se pueden cachear para siempre
+    if request.path.startswith("/static/uploads/") and response.status_code in (200, 304):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+    return response
+
+# --- PREVIEWS DE LINKS ---
+PREVIEW_WORKERS = int(os.getenv("PREVIEW_WORKERS", 4))
+PREVIEW_QUEUE_MAX = int(os.getenv("PREVIEW_QUEUE_MAX", 100))
+PREVIEW_MAX_BYTES = int(os.getenv("PREVIEW_MAX_BYTES", 64 * 1024))  # solo leemos el <head>
+PREVIEW_CACHE_MAX = int(os.getenv("PREVIEW_CACHE_MAX", 500))
+PREVIEW_TTL = int(os.getenv("PREVIEW_TTL", 3600))
+PREVIEW_TTL_FALLO = int(os.getenv("PREVIEW_TTL_FALLO", 300))  # cache negativo
+
+
+preview_service = PreviewService(
+    PREVIEW_WORKERS, PREVIEW_QUEUE_MAX,
+    PreviewCache(PREVIEW_CACHE_MAX, PREVIEW_TTL, PREVIEW_TTL_FALLO),
+    PREVIEW_MAX_BYTES, emitir=difusor.emitir, medir=lambda: medir_http("preview"),
+)
 
 @app.route('/forgot-password', methods=['POST'])
 def forgot_password():
@@ -319,8 +1125,11 @@ def forgot_password():
     msg = Message("Recuperación de contraseña", sender=app.config['MAIL_USERNAME'], recipients=[email])
     msg.html = html_body
 
-    # Spawn para enviar sin bloquear
-    eventlet.spawn(send_async_email, msg)
+    # Se encola: los workers de `correo` lo envían sin bloquear la respuesta
+    try:
+        correo.encolar(msg)
+    except ColaCorreoLlena:
+        return {"error": "Demasiadas solicitudes, intenta en unos minutos"}, 503
 
     return {"message": "Correo de recuperación enviado"}
 
@@ -343,7 +1152,7 @@ def reset_password():
             if datetime.utcnow() > token_data[1]:
                 return {"error": "Token expirado"}, 400
 
-            hashed_password = generate_password_hash(new_password)
+            hashed_password = hasher.generar(new_password)
             cur.execute("UPDATE usuarios SET password = %s WHERE id = %s", (hashed_password, token_data[0]))
             cur.execute("DELETE FROM reset_tokens WHERE token = %s", (token,))
             conn.commit()
@@ -361,18 +1170,24 @@ def pedido():
     artista = request.form.get('artista', '')
     fecha_hora = datetime.utcnow()
 
-    with get_sqlite_connection() as conn:
-        cur = conn.cursor()
-        cur.execute(
-            "INSERT INTO pedidos (nombre, cancion, dedicatoria, artista, fecha_hora) VALUES (?, ?, ?, ?, ?)",
-            (nombre, cancion, dedicatoria, artista, fecha_hora)
-        )
-        conn.commit()
+    # el conteo del ranking va en el mismo savepoint que el pedido
+    pedido_id = sqlite_store.insertar(
+        "INSERT INTO pedidos (nombre, cancion, dedicatoria, artista, fecha_hora) VALUES (?, ?, ?, ?, ?)",
+        (nombre, cancion, dedicatoria, artista, fecha_hora),
+        despues=ranking.sentencias(cancion, artista, fecha_hora)
+    )
+    ranking.agregar(cancion, artista, fecha_hora)
 
-    socketio.emit('nuevo_pedido', {
+    live_feed.agregar_pedido({
+        'id': pedido_id, 'nombre': nombre, 'cancion': cancion, 'dedicatoria': dedicatoria,
+        'artista': artista, 'fecha_hora': fecha_hora.isoformat(' ')
+    })
+    difusor.emitir('nuevo_pedido', {
+        'id': pedido_id, 'cursor': codificar_cursor(fecha_hora.isoformat(' '), pedido_id),
         'nombre': nombre, 'cancion': cancion, 'dedicatoria': dedicatoria,
         'artista': artista, 'fecha_hora': fecha_hora.strftime('%Y-%m-%d %H:%M:%S')
     })
+    programar_ranking()
     return '', 204
 
 @app.route('/recuperacion')
@@ -385,32 +1200,35 @@ def about():
 def comentario():
     nombre = request.form['nombre']
     mensaje = request.form['mensaje']
+
+    file_url = None
+    if 'imagen' in request.files:
+        file = request.files['imagen']
+        if file and allowed_file(file.filename):
+            file_url = url_thumb(guardar_upload(file))
+
+    # la fecha se toma recién acá: guardar_upload cede el hub y, si se tomara
+    # antes, otro comentario podría quedar con id mayor y fecha menor, y el
+    # cursor (fecha_hora, id) de /api/comentarios lo saltearía
     fecha_hora = datetime.utcnow()
+    comentario_id = sqlite_store.insertar(
+        "INSERT INTO comentarios (nombre, mensaje, imagen, fecha_hora) VALUES (?, ?, ?, ?)",
+        (nombre, mensaje, file_url, fecha_hora)
+    )
 
+    # la preview llega después por `preview_comentario` si no está en cache
     preview = None
     for word in mensaje.split():
         if word.startswith("http"):
-            preview = extract_link_preview(word)
+            preview = preview_service.solicitar(word, comentario_id)
             break
 
-    file_url = None
-    if 'imagen' in request.files:
-        file = request.files['imagen']
-        if file and allowed_file(file.filename):
-            filename = f"{uuid.uuid4().hex}_{file.filename}"
-            path = os.path.join("static/uploads", filename)
-            file.save(path)
-            file_url = f"/static/uploads/{filename}"
-
-    with get_sqlite_connection() as conn:
-        cur = conn.cursor()
-        cur.execute(
-            "INSERT INTO comentarios (nombre, mensaje, imagen, fecha_hora) VALUES (?, ?, ?, ?)",
-            (nombre, mensaje, file_url, fecha_hora)
-        )
-        conn.commit()
-
-    socketio.emit('nuevo_comentario', {
+    live_feed.agregar_comentario({
+        'id': comentario_id, 'nombre': nombre, 'mensaje': mensaje,
+        'imagen': file_url, 'fecha_hora': fecha_hora.isoformat(' ')
+    })
+    difusor.emitir('nuevo_comentario', {
+        'id': comentario_id, 'cursor': codificar_cursor(fecha_hora.isoformat(' '), comentario_id),
         'nombre': nombre, 'mensaje': mensaje,
         'fecha_hora': fecha_hora.strftime('%Y-%m-%d %H:%M:%S'),
         'preview': preview,
@@ -418,10 +1236,192 @@ def comentario():
     })
     return '', 204
 
+# --- API DEL FEED (paginación por cursor) ---
+API_LIMITE_DEFECTO = 50
+API_LIMITE_MAX = 200
+
+FEED_TABLAS = {
+    "pedidos": "id, nombre, cancion, dedicatoria, artista, fecha_hora",
+    "comentarios": "id, nombre, mensaje, imagen, fecha_hora",
+}
+
+
+def codificar_cursor(fecha_hora, fila_id):
+    return base64.urlsafe_b64encode(f"{fecha_hora}|{fila_id}".encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor):
+    try:
+        crudo = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        fecha_hora, fila_id = crudo.rsplit("|", 1)
+        return fecha_hora, int(fila_id)
+    except ValueError:
+        return None
+
+
+def feed_etag(conn, tabla, params):
+    # solo se inserta por el extremo nuevo y la limpieza borra por el viejo,
+    # así que los dos extremos del índice identifican el estado de la tabla
+    extremos = []
+    for orden in ("DESC", "ASC"):
+        fila = conn.execute(
+            f"SELECT fecha_hora, id FROM {tabla} ORDER BY fecha_hora {orden}, id {orden} LIMIT 1"
+        ).fetchone()
+        extremos.append(f"{fila[0]}|{fila[1]}" if fila else "")
+    base = f"{tabla}|{sorted(params.items())}|{extremos[0]}|{extremos[1]}"
+    return hashlib.sha1(base.encode()).hexdigest()
+
+
+def consultar_feed(tabla):
+    columnas = FEED_TABLAS[tabla]
+    since = request.args.get("since")
+    before = request.args.get("before")
+    try:
+        limite = min(int(request.args.get("limit", API_LIMITE_DEFECTO)), API_LIMITE_MAX)
+    except ValueError:
+        return {"error": "limit inválido"}, 400
+    if limite < 1:
+        return {"error": "limit inválido"}, 400
+
+    cursor_since = decodificar_cursor(since) if since else None
+    cursor_before = decodificar_cursor(before) if before else None
+    if (since and not cursor_since) or (before and not cursor_before):
+        return {"error": "Cursor inválido"}, 400
+
+    with sqlite_store.lectura() as conn:
+        etag = feed_etag(conn, tabla, {"since": since, "before": before, "limit": limite})
+        if request.if_none_match.contains(etag):
+            return Response(status=304, headers={"ETag": f'"{etag}"'})
+
+        # keyset sobre idx_{tabla}_fecha; el id desempata filas con la misma fecha
+        if cursor_since:
+            filas = conn.execute(
+                f"SELECT {columnas} FROM {tabla} WHERE (fecha_hora, id) > (?, ?) "
+                "ORDER BY fecha_hora ASC, id ASC LIMIT ?",
+                (*cursor_since, limite + 1)
+            ).fetchall()
+        elif cursor_before:
+            filas = conn.execute(
+                f"SELECT {columnas} FROM {tabla} WHERE (fecha_hora, id) < (?, ?) "
+                "ORDER BY fecha_hora DESC, id DESC LIMIT ?",
+                (*cursor_before, limite + 1)
+            ).fetchall()
+        else:
+            filas = conn.execute(
+                f"SELECT {columnas} FROM {tabla} ORDER BY fecha_hora DESC, id DESC LIMIT ?",
+                (limite + 1,)
+            ).fetchall()
+
+    hay_mas = len(filas) > limite
+    items = [dict(r) for r in filas[:limite]]
+    for item in items:
+        item["cursor"] = codificar_cursor(item["fecha_hora"], item["id"])
+
+    if cursor_since:
+        # orden cronológico: el cliente aplica los items tal cual y guarda `cursor`
+        respuesta = {"items": items, "cursor": items[-1]["cursor"] if items else since, "hay_mas": hay_mas}
+    else:
+        respuesta = {
+            "items": items,
+            "cursor": items[0]["cursor"] if items else before,
+            "siguiente": items[-1]["cursor"] if hay_mas else None,
+            "hay_mas": hay_mas,
+        }
+
+    resp = jsonify(respuesta)
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+
+@app.route('/api/pedidos')
+def api_pedidos():
+    return consultar_feed("pedidos")
+
+
+@app.route('/api/comentarios')
+def api_comentarios():
+    return consultar_feed("comentarios")
+
+
+@app.route('/api/ranking')
+def api_ranking():
+    ventana = request.args.get("ventana", RANKING_VENTANA_VIVO)
+    if ventana not in RANKING_VENTANAS:
+        return {"error": f"ventana inválida, opciones: {', '.join(RANKING_VENTANAS)}"}, 400
+    try:
+        top = int(request.args.get("top", RANKING_TOP))
+    except ValueError:
+        return {"error": "top inválido"}, 400
+    if not 1 <= top <= RANKING_TOP:
+        return {"error": f"top debe estar entre 1 y {RANKING_TOP}"}, 400
+
+    # el ETag sale del contenido: `ranking.version` es por proceso y se
+    # reinicia con cada arranque, no sirve entre workers ni entre reinicios
+    cuerpo = json.dumps({"ventana": ventana, **ranking.top(ventana, top)}, ensure_ascii=False, sort_keys=True)
+    etag = hashlib.sha1(cuerpo.encode()).hexdigest()
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers={"ETag": f'"{etag}"'})
+    resp = Response(cuerpo, mimetype="application/json")
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+
+# --- BÚSQUEDA DE PEDIDOS (FTS5) ---
+BUSQUEDA_TERMINOS_MAX = 8
+
+
+def consulta_fts(texto):
+    # cada palabra como prefijo entre comillas: el usuario no escribe sintaxis FTS5
+    terminos = re.findall(r"\w+", texto)[:BUSQUEDA_TERMINOS_MAX]
+    return " ".join(f'"{t}"*' for t in terminos)
+
+
+@app.route('/api/pedidos/buscar')
+def buscar_pedidos():
+    consulta = consulta_fts(request.args.get("q", ""))
+    if not consulta:
+        return {"error": "Falta el texto a buscar (q)"}, 400
+    before = request.args.get("before")
+    try:
+        limite = min(int(request.args.get("limit", API_LIMITE_DEFECTO)), API_LIMITE_MAX)
+    except ValueError:
+        return {"error": "limit inválido"}, 400
+    if limite < 1:
+        return {"error": "limit inválido"}, 400
+    cursor_before = decodificar_cursor(before) if before else None
+    if before and not cursor_before:
+        return {"error": "Cursor inválido"}, 400
+
+    # más nuevos primero por rowid (= id); el índice FTS ya viene en ese orden,
+    # así que solo se leen `limite` coincidencias aunque haya miles
+    columnas = ", ".join(f"p.{c.strip()}" for c in FEED_TABLAS["pedidos"].split(","))
+    with sqlite_store.lectura() as conn:
+        filas = conn.execute(
+            f"SELECT {columnas} FROM pedidos_fts JOIN pedidos p ON p.id = pedidos_fts.rowid "
+            "WHERE pedidos_fts MATCH ? AND pedidos_fts.rowid < ? "
+            "ORDER BY pedidos_fts.rowid DESC LIMIT ?",
+            (consulta, cursor_before[1] if cursor_before else 2 ** 63 - 1, limite + 1)
+        ).fetchall()
+
+    hay_mas = len(filas) > limite
+    items = [dict(r) for r in filas[:limite]]
+    for item in items:
+        item["cursor"] = codificar_cursor(item["fecha_hora"], item["id"])
+    return jsonify({
+        "items": items,
+        "siguiente": items[-1]["cursor"] if hay_mas else None,
+        "hay_mas": hay_mas,
+    })
+
+
 # --- Ejecutar app ---
 if __name__ == '__main__':
     port = int(os.environ.get("PORT", 8000))
     if ENV == "development":
         socketio.run(app, host='0.0.0.0', port=port, debug=True)
     else:
-        print("⚡ Producción detectada: usar gunicorn -k eventlet -w 1 app:app")
\ No newline at end of file
+        print("⚡ Producción detectada: usar gunicorn -k eventlet -w 1 app:app")
+        print("   Para varios workers: SOCKETIO_MESSAGE_QUEUE=redis://... (o local://host:puerto con mq_local.py)")
+        print("   y SOCKETIO_SOLO_WEBSOCKET=1 si no hay sesiones pegajosas: gunicorn -k eventlet -w 4 app:app")
\ No newline at end of file
@@ -0,0 +1,119 @@
+"""Mide el arranque en frío: tiempo de `import app` y tiempo al primer byte de `/`.
+
+Cada medición es un proceso nuevo, con ARRANQUE_DIFERIDO=1 (por defecto) y
+con ARRANQUE_DIFERIDO=0 (import sincrónico, como antes). Usa la
+DATABASE_URL del entorno; SQLite, uploads y la cache de imágenes van a un
+directorio temporal para no tocar los datos reales.
+
+    python benchmarks/arranque.py [repeticiones]
+"""
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+PESADOS = ("pandas", "numpy", "openpyxl", "bs4", "PIL")
+# la hoja no se descarga: se deja una copia en disco que coincide con esta URL
+SHEET_URL = "http://127.0.0.1:9/hoja.xlsx"
+
+IMPORTAR = f"""
+import json, sys, time
+sys.path.insert(0, {RAIZ!r})
+t0 = time.perf_counter()
+import app
+print(json.dumps({{
+    "import_s": time.perf_counter() - t0,
+    "pesados": [m for m in {PESADOS!r} if m in sys.modules],
+}}))
+"""
+
+SERVIR = f"""
+import sys
+sys.path.insert(0, {RAIZ!r})
+import app
+app.socketio.run(app.app, host="127.0.0.1", port=int(sys.argv[1]), log_output=False)
+"""
+
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def entorno(diferido, directorio):
+    env = dict(os.environ)
+    env.update({
+        "ARRANQUE_DIFERIDO": "1" if diferido else "0",
+        "SQLITE_PATH": os.path.join(directorio, "pedidos.db"),
+        "IMAGENES_CACHE_PATH": os.path.join(directorio, "imagenes.json"),
+        "SHEET_URL": SHEET_URL,
+    })
+    with open(env["IMAGENES_CACHE_PATH"], "w", encoding="utf-8") as f:
+        json.dump({"url": SHEET_URL, "urls": ["https://example.com/1.jpg"]}, f)
+    return env
+
+
+def medir_import(diferido, directorio):
+    salida = subprocess.run(
+        [sys.executable, "-c", IMPORTAR], env=entorno(diferido, directorio), cwd=directorio,
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def medir_primer_byte(diferido, directorio, timeout=60):
+    puerto = puerto_libre()
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-c", SERVIR, str(puerto)], env=entorno(diferido, directorio),
+        cwd=directorio, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - t0 < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f"el servidor terminó con código {proc.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{puerto}/", timeout=timeout) as r:
+                    r.read(1)
+                    return time.perf_counter() - t0
+            except (ConnectionError, urllib.error.URLError):
+                time.sleep(0.01)
+        raise RuntimeError("sin respuesta")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    repeticiones = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f"{repeticiones} arranques por modo (mediana)")
+    for nombre, diferido in (("diferido", True), ("sincrónico (antes)", False)):
+        imports, primeros = [], []
+        pesados = []
+        try:
+            for _ in range(repeticiones):
+                with tempfile.TemporaryDirectory() as directorio:
+                    r = medir_import(diferido, directorio)
+                    imports.append(r["import_s"])
+                    pesados = r["pesados"]
+                with tempfile.TemporaryDirectory() as directorio:
+                    primeros.append(medir_primer_byte(diferido, directorio))
+        except (subprocess.CalledProcessError, RuntimeError) as e:
+            detalle = e.stderr.strip().splitlines()[-1] if getattr(e, "stderr", None) else e
+            print(f"  {nombre:20s}: falló ({detalle})")
+            continue
+        print(f"  {nombre:20s}: import {statistics.median(imports) * 1000:7.1f} ms"
+              f"  primer byte de / {statistics.median(primeros) * 1000:7.1f} ms"
+              f"  módulos pesados: {', '.join(pesados) or 'ninguno'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,460 @@
+"""Prueba de carga de los caminos en tiempo real, sin red externa.
+
+Levanta la app en un proceso aparte contra stand-ins locales (pg_local.py
+para Postgres, y un servidor HTTP propio con la hoja XLSX del carrusel y
+páginas para las previews), conecta N oyentes Socket.IO por websocket y
+dispara ráfagas de POST /pedido y POST /comentario. Reporta throughput,
+p50/p99 de los POST y la latencia de punta a punta POST -> evento recibido.
+
+    python benchmarks/carga.py --oyentes 500 --rafagas 5 --por-rafaga 200
+    python benchmarks/carga.py --comparar benchmarks/resultados/<anterior>.json
+
+Los resultados quedan en benchmarks/resultados/ como JSON (con el commit)
+para comparar entre versiones. Para no saturar este proceso, la latencia de
+difusión se mide sobre una muestra de oyentes (--muestra); el resto solo
+recibe, que es lo que le cuesta al servidor.
+"""
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import io
+import json
+import os
+import random
+import resource
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+import zlib
+from datetime import datetime
+
+import eventlet.event
+import eventlet.queue
+import requests
+import simple_websocket
+from eventlet import wsgi
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, RAIZ)
+from pg_local import PostgresLocal  # noqa: E402
+
+RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resultados")
+
+SERVIR = f"""
+import sys
+sys.path.insert(0, {RAIZ!r})
+import app
+app.socketio.run(app.app, host="127.0.0.1", port=int(sys.argv[1]), log_output=False)
+"""
+
+
+# --- stand-ins ---
+def hoja_xlsx(urls):
+    """XLSX mínimo (una hoja, strings inline) con la columna `url`."""
+    filas = "".join(
+        f'<row r="{i}"><c r="A{i}" t="inlineStr"><is><t>{valor}</t></is></c></row>'
+        for i, valor in enumerate(["url"] + urls, start=1)
+    )
+    archivos = {
+        "[Content_Types].xml": (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/worksheets/sheet1.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            '</Types>'
+        ),
+        "xl/worksheets/sheet1.xml": (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            f'<sheetData>{filas}</sheetData></worksheet>'
+        ),
+    }
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        for nombre, contenido in archivos.items():
+            zf.writestr(nombre, contenido)
+    return buffer.getvalue()
+
+
+def imagen_png(lado=64):
+    """PNG RGB de `lado` x `lado` generado con la stdlib."""
+    def bloque(tipo, datos):
+        return struct.pack("!I", len(datos)) + tipo + datos + struct.pack("!I", zlib.crc32(tipo + datos))
+
+    crudo = b"".join(b"\0" + bytes(random.randrange(256) for _ in range(lado * 3)) for _ in range(lado))
+    return (b"\x89PNG\r\n\x1a\n" + bloque(b"IHDR", struct.pack("!IIBBBBB", lado, lado, 8, 2, 0, 0, 0))
+            + bloque(b"IDAT", zlib.compress(crudo)) + bloque(b"IEND", b""))
+
+
+def recursos(hoja):
+    """App WSGI con la hoja (/hoja.xlsx) y páginas para previews (/pagina/N)."""
+    def aplicacion(environ, start_response):
+        ruta = environ["PATH_INFO"]
+        if ruta == "/hoja.xlsx":
+            start_response("200 OK", [("Content-Type", "application/vnd.ms-excel")])
+            return [hoja]
+        if ruta.startswith("/pagina/"):
+            n = ruta.rsplit("/", 1)[-1]
+            html = (
+                f"<html><head><title>Página {n}</title>"
+                f'<meta name="description" content="Descripción de la página {n}">'
+                f'<meta property="og:image" content="https://example.com/{n}.jpg">'
+                f"</head><body>{'x' * 2048}</body></html>"
+            )
+            start_response("200 OK", [("Content-Type", "text/html; charset=utf-8")])
+            return [html.encode()]
+        start_response("404 Not Found", [("Content-Type", "text/plain")])
+        return [b"no"]
+    return aplicacion
+
+
+def servir_recursos(hoja):
+    servidor = eventlet.listen(("127.0.0.1", 0))
+    eventlet.spawn(wsgi.server, servidor, recursos(hoja), log=open(os.devnull, "w"), log_output=False)
+    return f"http://127.0.0.1:{servidor.getsockname()[1]}"
+
+
+def puerto_libre():
+    with eventlet.listen(("127.0.0.1", 0)) as sock:
+        return sock.getsockname()[1]
+
+
+def iniciar_pg_local():
+    listo = eventlet.event.Event()
+    eventlet.spawn(PostgresLocal(port=0).servir, listo)
+    return listo.wait()
+
+
+# --- medición ---
+def percentil(valores, p):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, max(0, int(round(p / 100 * len(ordenados))) - 1))]
+
+
+def resumen(latencias):
+    return {
+        "n": len(latencias),
+        "p50_ms": _ms(percentil(latencias, 50)),
+        "p90_ms": _ms(percentil(latencias, 90)),
+        "p99_ms": _ms(percentil(latencias, 99)),
+        "max_ms": _ms(max(latencias) if latencias else None),
+    }
+
+
+def _ms(segundos):
+    return round(segundos * 1000, 2) if segundos is not None else None
+
+
+class Oyente:
+    """Cliente Socket.IO mínimo por websocket (Engine.IO v4)."""
+
+    def __init__(self, url_ws, enviados, medir):
+        self.url_ws = url_ws
+        self.enviados = enviados  # marca -> perf_counter del POST
+        self.medir = medir
+        self.latencias = []
+        self.mensajes = 0
+        self.conectado = eventlet.event.Event()
+        self.activo = True
+
+    def _registrar(self, evento, data, t):
+        if evento == "lote":
+            for item in data:
+                self._registrar(item["evento"], item["data"], t)
+            return
+        if evento == "nuevo_pedido":
+            marca = data.get("cancion")
+        elif evento == "nuevo_comentario":
+            marca = data.get("mensaje", "").split(" ", 1)[0]
+        else:
+            return
+        t0 = self.enviados.get(marca)
+        if t0 is not None:
+            self.latencias.append(t - t0)
+
+    def correr(self):
+        try:
+            ws = simple_websocket.Client.connect(self.url_ws)
+        except Exception:
+            self.conectado.send(False)
+            return
+        try:
+            # el "40" va sin esperar el paquete "open" de Engine.IO: si este
+            # llega pegado al handshake, simple_websocket no lo procesa hasta
+            # que entren más datos
+            ws.send("40")
+            while self.activo:
+                mensaje = ws.receive(timeout=1)
+                if mensaje is None:
+                    continue
+                t = time.perf_counter()
+                if mensaje == "2":
+                    ws.send("3")
+                elif mensaje.startswith("40"):
+                    self.conectado.send(True)
+                elif mensaje.startswith("42"):
+                    self.mensajes += 1
+                    if self.medir:
+                        evento, data = json.loads(mensaje[2:])
+                        self._registrar(evento, data, t)
+            # pedimos el cierre al servidor (paquete "close" de Engine.IO)
+            # en vez de cortar el socket bajo el hilo lector del cliente
+            ws.send("1")
+            while ws.receive(timeout=5) is not None:
+                pass
+        except simple_websocket.ConnectionClosed:
+            pass
+        finally:
+            if not self.conectado.ready():
+                self.conectado.send(False)
+
+
+def postear(sesiones, base, tipo, marca, args, url_recursos, png, enviados, http, errores):
+    sesion = sesiones.get()
+    try:
+        if tipo == "pedido":
+            datos = {"nombre": "carga", "cancion": marca, "artista": f"Artista {random.randrange(50)}",
+                     "dedicatoria": "para todos"}
+            archivos = None
+        else:
+            mensaje = marca
+            if random.random() < args.con_link:
+                mensaje += f" mirá {url_recursos}/pagina/{random.randrange(args.paginas)}"
+            datos = {"nombre": "carga", "mensaje": mensaje}
+            archivos = {"imagen": ("carga.png", png, "image/png")} if random.random() < args.con_imagen else None
+        t0 = time.perf_counter()
+        enviados[marca] = t0
+        try:
+            r = sesion.post(f"{base}/{tipo}", data=datos, files=archivos, timeout=30)
+            estado = r.status_code
+        except requests.RequestException as e:
+            estado = type(e).__name__
+        if estado in (200, 204):
+            http[tipo].append(time.perf_counter() - t0)
+        else:
+            enviados.pop(marca, None)
+            errores[tipo][str(estado)] = errores[tipo].get(str(estado), 0) + 1
+    finally:
+        sesiones.put(sesion)
+
+
+def subir_limite_archivos():
+    blando, duro = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if blando < duro:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (duro, duro))
+
+
+def esperar(url, timeout=60):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        try:
+            if requests.get(url, timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        eventlet.sleep(0.1)
+    raise RuntimeError(f"{url} no respondió a tiempo")
+
+
+def commit_actual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconocido"
+
+
+def correr(args):
+    subir_limite_archivos()
+    url_recursos = servir_recursos(hoja_xlsx([f"https://example.com/{i}.jpg" for i in range(40)]))
+    puerto_pg = iniciar_pg_local()
+    png = imagen_png()
+
+    puerto = puerto_libre()
+    with tempfile.TemporaryDirectory() as directorio:
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"postgresql://radio@127.0.0.1:{puerto_pg}/radio?sslmode=disable",
+            SQLITE_PATH=os.path.join(directorio, "pedidos.db"),
+            IMAGENES_CACHE_PATH=os.path.join(directorio, "imagenes_cache.json"),
+            SHEET_URL=f"{url_recursos}/hoja.xlsx",
+            BROADCAST_MODO=args.modo,
+            SOCKETIO_LOGGER="0",
+        )
+        servidor = subprocess.Popen(
+            [sys.executable, "-c", SERVIR, str(puerto)], env=env, cwd=directorio,
+            stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL
+        )
+        base = f"http://127.0.0.1:{puerto}"
+        try:
+            esperar(f"{base}/salud")
+            esperar(f"{base}/")  # también calienta la cache de imágenes
+            return medir(args, base, url_recursos, png)
+        finally:
+            servidor.terminate()
+            servidor.wait()
+
+
+def medir(args, base, url_recursos, png):
+    enviados = {}
+    url_ws = base.replace("http://", "ws://") + "/socket.io/?EIO=4&transport=websocket"
+    oyentes = [Oyente(url_ws, enviados, medir=i < args.muestra) for i in range(args.oyentes)]
+
+    # conexión de los oyentes, de a poco para no desbordar el backlog
+    t0 = time.perf_counter()
+    pool_oyentes = eventlet.GreenPool(args.oyentes + 1)
+    lanzador = eventlet.GreenPool(50)
+    for oyente in oyentes:
+        lanzador.spawn_n(lambda o: (pool_oyentes.spawn_n(o.correr), o.conectado.wait()), oyente)
+    lanzador.waitall()
+    conectados = sum(1 for o in oyentes if o.conectado.wait())
+    segundos_conexion = time.perf_counter() - t0
+    print(f"  {conectados}/{args.oyentes} oyentes conectados en {segundos_conexion:.1f}s")
+
+    sesiones = eventlet.queue.LightQueue()
+    for _ in range(args.concurrencia):
+        sesiones.put(requests.Session())
+    http = {"pedido": [], "comentario": []}
+    errores = {"pedido": {}, "comentario": {}}
+
+    t_posts = 0.0  # solo el tiempo de las ráfagas, sin las pausas
+    n = 0
+    for rafaga in range(args.rafagas):
+        t0 = time.perf_counter()
+        pool = eventlet.GreenPool(args.concurrencia)
+        for _ in range(args.por_rafaga):
+            tipo = "comentario" if random.random() < args.comentarios else "pedido"
+            n += 1
+            pool.spawn_n(postear, sesiones, base, tipo, f"carga-{n}", args, url_recursos, png,
+                         enviados, http, errores)
+        pool.waitall()
+        t_posts += time.perf_counter() - t0
+        print(f"  ráfaga {rafaga + 1}/{args.rafagas}: {n} POST")
+        if rafaga + 1 < args.rafagas:
+            eventlet.sleep(args.pausa)
+
+    # esperar a que la muestra reciba todo (o se venza el plazo)
+    muestra = [o for o in oyentes if o.medir and o.conectado.wait()]
+    esperadas = len(enviados) * len(muestra)
+    limite = time.monotonic() + args.espera
+    while sum(len(o.latencias) for o in muestra) < esperadas and time.monotonic() < limite:
+        eventlet.sleep(0.1)
+    for oyente in oyentes:
+        oyente.activo = False
+    pool_oyentes.waitall()
+
+    stats = requests.get(f"{base}/stats", timeout=10).json()
+    latencias = [t for o in muestra for t in o.latencias]
+    ok = len(http["pedido"]) + len(http["comentario"])
+    return {
+        "fecha": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "commit": None,
+        "parametros": vars(args),
+        "http": {
+            "duracion_s": round(t_posts, 3),
+            "ok_por_s": round(ok / t_posts, 1) if t_posts else None,
+            "total": resumen(http["pedido"] + http["comentario"]),
+            "pedido": dict(resumen(http["pedido"]), errores=errores["pedido"]),
+            "comentario": dict(resumen(http["comentario"]), errores=errores["comentario"]),
+        },
+        "difusion": dict(
+            resumen(latencias),
+            oyentes=args.oyentes, conectados=conectados, conexion_s=round(segundos_conexion, 2),
+            muestra=len(muestra), esperadas=esperadas, recibidas=len(latencias),
+            perdidas=esperadas - len(latencias),
+            mensajes_totales=sum(o.mensajes for o in oyentes),
+        ),
+        "servidor": {clave: stats.get(clave) for clave in ("difusion", "sqlite")},
+    }
+
+
+# --- reporte ---
+CLAVES_COMPARACION = (
+    ("http", "ok_por_s", "POST/s"),
+    ("http.total", "p50_ms", "POST p50 ms"),
+    ("http.total", "p99_ms", "POST p99 ms"),
+    ("difusion", "p50_ms", "difusión p50 ms"),
+    ("difusion", "p99_ms", "difusión p99 ms"),
+    ("difusion", "perdidas", "eventos perdidos"),
+)
+
+
+def _valor(resultado, ruta, clave):
+    for parte in ruta.split("."):
+        resultado = resultado.get(parte, {})
+    return resultado.get(clave)
+
+
+def imprimir(resultado, anterior=None):
+    if anterior:
+        print(f"comparado con {anterior['commit']} ({anterior['fecha']})")
+        distintos = [
+            clave for clave, valor in resultado["parametros"].items()
+            if clave not in ("salida", "comparar", "verbose") and anterior["parametros"].get(clave) != valor
+        ]
+        if distintos:
+            print(f"  ⚠️ parámetros distintos: {', '.join(distintos)}")
+    for ruta, clave, nombre in CLAVES_COMPARACION:
+        actual = _valor(resultado, ruta, clave)
+        linea = f"  {nombre:18s}: {actual}"
+        if anterior:
+            previo = _valor(anterior, ruta, clave)
+            linea += f"  (antes {previo}"
+            if actual is not None and previo:
+                linea += f", {(actual - previo) / previo * 100:+.1f}%"
+            linea += ")"
+        print(linea)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga offline de la radio")
+    parser.add_argument("--oyentes", type=int, default=200)
+    parser.add_argument("--muestra", type=int, default=20, help="oyentes que miden la latencia de difusión")
+    parser.add_argument("--rafagas", type=int, default=5)
+    parser.add_argument("--por-rafaga", type=int, default=100)
+    parser.add_argument("--pausa", type=float, default=1.0, help="segundos entre ráfagas")
+    parser.add_argument("--concurrencia", type=int, default=20, help="POST en vuelo a la vez")
+    parser.add_argument("--comentarios", type=float, default=0.3, help="fracción de POST /comentario")
+    parser.add_argument("--con-link", type=float, default=0.5, help="fracción de comentarios con link")
+    parser.add_argument("--con-imagen", type=float, default=0.1, help="fracción de comentarios con imagen")
+    parser.add_argument("--paginas", type=int, default=50, help="páginas distintas para las previews")
+    parser.add_argument("--modo", default="lotes", choices=("lotes", "simple"), help="BROADCAST_MODO")
+    parser.add_argument("--espera", type=float, default=15.0, help="plazo para recibir los últimos eventos")
+    parser.add_argument("--salida", help="archivo JSON de resultados (por defecto en benchmarks/resultados/)")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior")
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--verbose", action="store_true", help="muestra el stderr de la app")
+    args = parser.parse_args()
+    random.seed(args.semilla)
+    commit = commit_actual()
+
+    print(f"{args.oyentes} oyentes, {args.rafagas} ráfagas de {args.por_rafaga} POST, modo {args.modo}")
+    resultado = correr(args)
+    resultado["commit"] = commit
+
+    salida = args.salida
+    if salida is None:
+        os.makedirs(RESULTADOS, exist_ok=True)
+        salida = os.path.join(
+            RESULTADOS, f"carga-{resultado['commit']}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+
+    anterior = None
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            anterior = json.load(f)
+    imprimir(resultado, anterior)
+    print(f"resultados en {salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Mide cuánto se congela el hub durante una ráfaga de logins concurrentes.
+
+Un greenlet "latido" duerme 5 ms en bucle y registra el retraso con el que
+despierta; mientras tanto N greenlets verifican contraseñas, primero
+directamente en el hub (como antes) y luego con PasswordHasher.
+
+    python benchmarks/hash_login.py [logins]
+"""
+import eventlet
+eventlet.monkey_patch()
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from werkzeug.security import check_password_hash  # noqa: E402
+
+from passwords import PasswordHasher  # noqa: E402
+
+INTERVALO = 0.005
+
+
+def latido(retrasos, activo):
+    while activo[0]:
+        t0 = time.perf_counter()
+        eventlet.sleep(INTERVALO)
+        retrasos.append(time.perf_counter() - t0 - INTERVALO)
+
+
+def rafaga(verificar, password_hash, logins):
+    retrasos, activo = [], [True]
+    monitor = eventlet.spawn(latido, retrasos, activo)
+    eventlet.sleep(0)
+    t0 = time.perf_counter()
+    pool = eventlet.GreenPool(logins)
+    for _ in range(logins):
+        pool.spawn_n(verificar, password_hash, "contraseña")
+    pool.waitall()
+    total = time.perf_counter() - t0
+    activo[0] = False
+    monitor.wait()
+    retrasos.sort()
+    return total, max(retrasos), retrasos[int(len(retrasos) * 0.99) - 1] if retrasos else 0.0
+
+
+def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    hasher = PasswordHasher(concurrencia=2)
+    password_hash = hasher.generar("contraseña")
+
+    filas = [
+        ("en el hub (antes)", check_password_hash),
+        ("PasswordHasher (tpool)", hasher.verificar),
+    ]
+    print(f"{logins} logins concurrentes, {hasher.metodo}")
+    for nombre, verificar in filas:
+        total, maximo, p99 = rafaga(verificar, password_hash, logins)
+        print(f"  {nombre:24s}: total {total:6.2f}s  bloqueo máx del hub {maximo * 1000:8.1f} ms"
+              f"  p99 {p99 * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
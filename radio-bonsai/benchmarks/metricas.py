@@ -0,0 +1,76 @@
+"""Costo de la instrumentación: cuánto agrega cada observación y cada request.
+
+    python benchmarks/metricas.py [iteraciones]
+"""
+import eventlet
+eventlet.monkey_patch()
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from flask import Flask, g, request  # noqa: E402
+
+from metricas import Registro  # noqa: E402
+
+
+def por_llamada(fn, iteraciones):
+    t0 = time.perf_counter()
+    for _ in range(iteraciones):
+        fn()
+    return (time.perf_counter() - t0) / iteraciones
+
+
+def app_de_prueba(medir):
+    app = Flask(__name__)
+    registro = Registro()
+    h = registro.histograma("req", "req", ("ruta", "metodo", "estado"))
+
+    if medir:
+        @app.before_request
+        def antes():
+            g.t0 = time.perf_counter()
+
+        @app.after_request
+        def despues(response):
+            h.observar(time.perf_counter() - g.pop("t0"), request.endpoint, request.method, response.status_code)
+            return response
+
+    @app.route("/")
+    def index():
+        return "ok"
+
+    return app.test_client()
+
+
+def main():
+    iteraciones = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    registro = Registro()
+    h = registro.histograma("x", "x", ("base", "operacion"))
+    c = registro.contador("y", "y", ("destino",))
+
+    def observar():
+        h.observar(0.003, "sqlite", "SELECT")
+
+    def medir():
+        with h.medir("sqlite", "SELECT"):
+            pass
+
+    print(f"{iteraciones} iteraciones")
+    print(f"  Histograma.observar     : {por_llamada(observar, iteraciones) * 1e9:8.0f} ns")
+    print(f"  Histograma.medir (with) : {por_llamada(medir, iteraciones) * 1e9:8.0f} ns")
+    print(f"  Contador.inc            : {por_llamada(lambda: c.inc('sheets'), iteraciones) * 1e9:8.0f} ns")
+
+    n_requests = max(iteraciones // 20, 1000)
+    cliente_sin, cliente_con = app_de_prueba(False), app_de_prueba(True)
+    for cliente in (cliente_sin, cliente_con):
+        por_llamada(lambda: cliente.get("/"), 1000)  # calentamiento
+    sin = por_llamada(lambda: cliente_sin.get("/"), n_requests)
+    con = por_llamada(lambda: cliente_con.get("/"), n_requests)
+    print(f"  request Flask sin medir : {sin * 1e6:8.1f} µs")
+    print(f"  request Flask medido    : {con * 1e6:8.1f} µs  (+{(con - sin) * 1e6:.1f} µs)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Comprueba que un `nuevo_pedido` enviado al worker A llega a clientes del worker B.
+
+Levanta el broker local (mq_local.py) y dos procesos de la app en puertos
+distintos que comparten la misma base SQLite, conecta un cliente Socket.IO
+a B y hace POST /pedido contra A.
+
+    python benchmarks/prueba_multiworker.py
+
+Usa DATABASE_URL del entorno igual que la app.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+import socketio
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+PUERTO_BROKER = 5599
+PUERTOS = (8811, 8812)
+
+WORKER = (
+    "import app, os; "
+    "app.socketio.run(app.app, host='127.0.0.1', port=int(os.environ['PORT']), log_output=False)"
+)
+
+
+def esperar_puerto(url, timeout=30):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} no respondió a tiempo")
+
+
+def main():
+    procesos = []
+    with tempfile.TemporaryDirectory() as directorio:
+        env = dict(
+            os.environ,
+            PYTHONPATH=os.pathsep.join(filter(None, [RAIZ, os.environ.get("PYTHONPATH")])),
+            SOCKETIO_MESSAGE_QUEUE=f"local://127.0.0.1:{PUERTO_BROKER}",
+            SQLITE_PATH=os.path.join(directorio, "pedidos.db"),
+            IMAGENES_CACHE_PATH=os.path.join(directorio, "imagenes_cache.json"),
+            BROADCAST_VENTANA="0.05",
+        )
+        try:
+            procesos.append(subprocess.Popen(
+                [sys.executable, os.path.join(RAIZ, "mq_local.py"), "--port", str(PUERTO_BROKER)],
+                env=env, cwd=directorio
+            ))
+            for puerto in PUERTOS:
+                procesos.append(subprocess.Popen(
+                    [sys.executable, "-c", WORKER], env=dict(env, PORT=str(puerto)), cwd=directorio
+                ))
+            worker_a, worker_b = (f"http://127.0.0.1:{p}" for p in PUERTOS)
+            esperar_puerto(f"{worker_a}/stats")
+            esperar_puerto(f"{worker_b}/stats")
+
+            recibido = threading.Event()
+            cliente = socketio.Client()
+
+            @cliente.on("nuevo_pedido")
+            def nuevo_pedido(data):
+                if data["cancion"] == "Prueba multiworker":
+                    recibido.set()
+
+            @cliente.on("lote")
+            def lote(eventos):
+                for evento in eventos:
+                    if evento["evento"] == "nuevo_pedido":
+                        nuevo_pedido(evento["data"])
+
+            cliente.connect(worker_b)
+            time.sleep(0.5)  # que el suscriptor del broker esté listo
+            t0 = time.perf_counter()
+            r = requests.post(f"{worker_a}/pedido", data={"nombre": "multi", "cancion": "Prueba multiworker"})
+            assert r.status_code == 204, r.status_code
+
+            ok = recibido.wait(timeout=10)
+            cliente.disconnect()
+            if not ok:
+                print("❌ El pedido enviado a A no llegó al cliente de B")
+                sys.exit(1)
+            print(f"✅ Pedido de A recibido en B en {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+            # el feed en memoria de B también debe tenerlo
+            if "Prueba multiworker" not in requests.get(worker_b).text:
+                print("❌ El feed de B no incluye el pedido enviado a A")
+                sys.exit(1)
+            print("✅ El feed de B incluye el pedido")
+        finally:
+            for proceso in procesos:
+                proceso.terminate()
+            for proceso in procesos:
+                proceso.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Ranking y búsqueda a medida que crece el historial de pedidos.
+
+Para cada tamaño arma una base nueva (con las migraciones, así que los
+triggers de FTS5 y ranking_horas se llenan igual que en producción) y mide:
+top-N desde el ranking en memoria contra un GROUP BY sobre `pedidos`, y la
+búsqueda por FTS5 contra un LIKE. Lo nuevo debería quedar plano.
+
+    python benchmarks/ranking_busqueda.py [tamaños...]   (por defecto 1000 10000 100000)
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from migraciones import migrar_sqlite  # noqa: E402
+from ranking import Ranking, entradas, hora_de  # noqa: E402
+from sqlite_store import conectar  # noqa: E402
+
+PALABRAS = "amor noche luna corazón fuego cielo mar sol lluvia viento camino sueño".split()
+# catálogo fijo: lo que crece es el historial, no la cantidad de canciones
+CATALOGO = [(" ".join(random.Random(i).sample(PALABRAS, 2)).title(), f"Banda{i % 500}") for i in range(2000)]
+BUSCADO = "banda123"  # un artista entre 500
+VENTANAS = {"hora": 1, "dia": 24, "semana": 168}
+
+SQL_TOP = (
+    "SELECT cancion, artista, COUNT(*) AS n FROM pedidos WHERE fecha_hora >= ? "
+    "GROUP BY lower(cancion), lower(artista) ORDER BY n DESC LIMIT 10"
+)
+SQL_FTS = (
+    "SELECT p.id FROM pedidos_fts JOIN pedidos p ON p.id = pedidos_fts.rowid "
+    "WHERE pedidos_fts MATCH ? ORDER BY pedidos_fts.rowid DESC LIMIT 20"
+)
+SQL_LIKE = (
+    "SELECT id FROM pedidos WHERE cancion LIKE ? OR artista LIKE ? OR dedicatoria LIKE ? "
+    "ORDER BY id DESC LIMIT 20"
+)
+
+
+class StoreDirecto:
+    """Lo mínimo de SQLiteStore que usa Ranking.cargar, sobre una conexión."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def lectura(self):
+        conn = self.conn
+
+        class _Ctx:
+            def __enter__(self):
+                return conn
+
+            def __exit__(self, *exc):
+                return False
+
+        return _Ctx()
+
+    def mantenimiento(self, fn):
+        return fn(self.conn)
+
+
+def poblar(conn, n):
+    # pedidos repartidos en dos semanas; el último es ahora
+    ahora = datetime.utcnow()
+    filas, upserts = [], {}
+    for i in range(n):
+        fecha = ahora - timedelta(seconds=(n - i) * 14 * 86400 / n)
+        cancion, artista = random.choice(CATALOGO)
+        filas.append(("oyente", cancion, f"para {random.choice(PALABRAS)}", artista, fecha.isoformat(" ")))
+        for tipo, clave, nombre in entradas(cancion, artista):
+            k = (hora_de(fecha), tipo, clave)
+            upserts.setdefault(k, [nombre, 0])[1] += 1
+    conn.execute("BEGIN")
+    conn.executemany(
+        "INSERT INTO pedidos (nombre, cancion, dedicatoria, artista, fecha_hora) VALUES (?, ?, ?, ?, ?)", filas
+    )
+    conn.executemany(
+        "INSERT INTO ranking_horas (hora, tipo, clave, nombre, conteo) VALUES (?, ?, ?, ?, ?)",
+        [(*k, nombre, conteo) for k, (nombre, conteo) in upserts.items()]
+    )
+    conn.execute("COMMIT")
+
+
+def medir(fn, repeticiones):
+    fn()  # calentamiento
+    t0 = time.perf_counter()
+    for _ in range(repeticiones):
+        fn()
+    return (time.perf_counter() - t0) / repeticiones * 1000
+
+
+def main():
+    tamanos = [int(x) for x in sys.argv[1:]] or [1000, 10000, 100000]
+    random.seed(17)
+    print(f"{'pedidos':>9} {'top mem':>9} {'top SQL':>9} {'FTS5':>9} {'LIKE':>9} {'insert':>9}   (ms)")
+    for n in tamanos:
+        with tempfile.TemporaryDirectory() as tmp:
+            conn = conectar(os.path.join(tmp, "pedidos.db"))
+            migrar_sqlite(conn)
+            poblar(conn, n)
+
+            ranking = Ranking(VENTANAS, top=10)
+            ranking.cargar(StoreDirecto(conn))
+            corte = (datetime.utcnow() - timedelta(days=7)).isoformat(" ")
+
+            def top_memoria():
+                # el cache de top() se invalida con cada pedido: se mide el peor caso
+                ranking._cambio()
+                ranking.top("semana")
+
+            t_top = medir(top_memoria, 200)
+            t_sql = medir(lambda: conn.execute(SQL_TOP, (corte,)).fetchall(), 5)
+            t_fts = medir(lambda: conn.execute(SQL_FTS, (f'"{BUSCADO}"*',)).fetchall(), 200)
+            t_like = medir(lambda: conn.execute(SQL_LIKE, (f"%{BUSCADO}%",) * 3).fetchall(), 20)
+
+            # costo del pedido: INSERT + trigger FTS5 + upserts del ranking, en una transacción
+            fecha = datetime.utcnow()
+
+            def insertar():
+                conn.execute("BEGIN")
+                conn.execute(
+                    "INSERT INTO pedidos (nombre, cancion, dedicatoria, artista, fecha_hora) VALUES (?, ?, ?, ?, ?)",
+                    ("oyente", "Luna Mar", "para sol", "Banda1", fecha)
+                )
+                for sql, params in ranking.sentencias("Luna Mar", "Banda1", fecha):
+                    conn.execute(sql, params)
+                conn.execute("COMMIT")
+
+            t_insert = medir(insertar, 200)
+            conn.close()
+        print(f"{n:>9} {t_top:>9.3f} {t_sql:>9.3f} {t_fts:>9.3f} {t_like:>9.3f} {t_insert:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Compara inserts concurrentes: conexión por request vs. SQLiteStore.
+
+    python benchmarks/sqlite_escrituras.py [greenlets] [inserts_por_greenlet]
+"""
+import eventlet
+eventlet.monkey_patch()
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from sqlite_store import SQLiteStore  # noqa: E402
+
+ESQUEMA = """
+    CREATE TABLE IF NOT EXISTS pedidos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nombre TEXT NOT NULL,
+        cancion TEXT NOT NULL,
+        dedicatoria TEXT,
+        artista TEXT,
+        fecha_hora TIMESTAMP NOT NULL
+    )
+"""
+INSERT = "INSERT INTO pedidos (nombre, cancion, dedicatoria, artista, fecha_hora) VALUES (?, ?, ?, ?, ?)"
+
+
+def fila(i):
+    return ("oyente", f"cancion {i}", "para todos", "artista", "2025-01-01 00:00:00")
+
+
+def crear_db(directorio, nombre):
+    path = os.path.join(directorio, nombre)
+    conn = sqlite3.connect(path)
+    conn.execute(ESQUEMA)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def por_request(path, greenlets, n):
+    # lo que hacía la app antes: conexión nueva + commit por insert
+    def worker(g):
+        for i in range(n):
+            with sqlite3.connect(path, check_same_thread=False, timeout=30) as conn:
+                conn.execute(INSERT, fila(g * n + i))
+                conn.commit()
+            eventlet.sleep(0)
+
+    pool = eventlet.GreenPool(greenlets)
+    for g in range(greenlets):
+        pool.spawn_n(worker, g)
+    pool.waitall()
+
+
+def con_store(path, greenlets, n):
+    store = SQLiteStore(path)
+
+    def worker(g):
+        for i in range(n):
+            store.insertar(INSERT, fila(g * n + i))
+
+    pool = eventlet.GreenPool(greenlets)
+    for g in range(greenlets):
+        pool.spawn_n(worker, g)
+    pool.waitall()
+    return store
+
+
+def medir(fn, *args):
+    t0 = time.perf_counter()
+    resultado = fn(*args)
+    dt = time.perf_counter() - t0
+    return dt, resultado
+
+
+def main():
+    greenlets = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    total = greenlets * n
+
+    with tempfile.TemporaryDirectory() as d:
+        dt_a, _ = medir(por_request, crear_db(d, "a.db"), greenlets, n)
+        dt_b, store = medir(con_store, crear_db(d, "b.db"), greenlets, n)
+
+    print(f"{total} inserts desde {greenlets} greenlets")
+    print(f"  conexión por request : {dt_a:8.3f}s  {total / dt_a:10.0f} inserts/s")
+    print(f"  SQLiteStore (WAL)    : {dt_b:8.3f}s  {total / dt_b:10.0f} inserts/s"
+          f"  ({store.stats()['por_lote']} inserts por commit)")
+    print(f"  mejora               : x{dt_a / dt_b:.1f}")
+
+
+if __name__ == "__main__":
+    main()
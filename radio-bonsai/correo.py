@@ -0,0 +1,157 @@
+import smtplib
+import time
+
+import eventlet
+import eventlet.queue
+import eventlet.semaphore
+
+
+class ColaCorreoLlena(Exception):
+    pass
+
+
+def _permanente(e):
+    if isinstance(e, smtplib.SMTPRecipientsRefused):
+        # no es SMTPResponseException: el código viene por destinatario
+        return bool(e.recipients) and all(codigo >= 500 for codigo, _ in e.recipients.values())
+    return isinstance(e, smtplib.SMTPResponseException) and e.smtp_code >= 500
+
+
+class LimiteEnvio:
+    """Token bucket: como mucho `por_minuto` correos por minuto, con ráfagas de `rafaga`."""
+
+    def __init__(self, por_minuto, rafaga):
+        self.tasa = por_minuto / 60.0
+        self.capacidad = rafaga
+        self.tokens = float(rafaga)
+        self.ultimo = time.monotonic()
+        self._lock = eventlet.semaphore.Semaphore()
+
+    def esperar(self):
+        with self._lock:
+            while True:
+                ahora = time.monotonic()
+                self.tokens = min(self.capacidad, self.tokens + (ahora - self.ultimo) * self.tasa)
+                self.ultimo = ahora
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                eventlet.sleep((1 - self.tokens) / self.tasa)
+
+
+class ServicioCorreo:
+    """Cola acotada de correos drenada por unos pocos workers.
+
+    Cada worker mantiene abierta su conexión SMTP autenticada y la reutiliza
+    entre envíos; la cierra tras `idle` segundos sin correos. Los fallos se
+    reintentan con backoff exponencial y el envío respeta un límite por
+    minuto para no pasarse de la cuota del proveedor. Flask-Mail abre el
+    SMTP sin timeout: conexión y envío se cortan a los `timeout` segundos y
+    cuentan como un fallo transitorio.
+    """
+
+    def __init__(self, app, mail, workers=2, cola_max=200, por_minuto=60,
+                 rafaga=10, reintentos=4, backoff=2.0, idle=60, timeout=30):
+        self.app = app
+        self.mail = mail
+        self.workers = workers
+        self.cola = eventlet.queue.LightQueue(cola_max)
+        self.limite = LimiteEnvio(por_minuto, rafaga)
+        self.reintentos = reintentos
+        self.backoff = backoff
+        self.idle = idle
+        self.timeout = timeout
+        self._pool = None
+        self.encolados = 0
+        self.enviados = 0
+        self.fallidos = 0
+        self.reintentados = 0
+        self.conexiones = 0
+        self.latencia_total = 0.0
+        self.ultimo_error = None
+
+    def iniciar(self):
+        if self._pool is None:
+            self._pool = eventlet.GreenPool(self.workers)
+            for _ in range(self.workers):
+                self._pool.spawn_n(self._worker)
+
+    def encolar(self, msg):
+        self.iniciar()
+        try:
+            self.cola.put_nowait((msg, time.monotonic()))
+        except eventlet.queue.Full:
+            raise ColaCorreoLlena()
+        self.encolados += 1
+
+    def _cerrar(self, conn):
+        try:
+            with eventlet.Timeout(self.timeout, TimeoutError("QUIT sin respuesta")):
+                conn.__exit__(None, None, None)
+        except (smtplib.SMTPException, OSError):
+            # servidor colgado: se cierra el socket sin despedirse
+            if getattr(conn, "host", None) is not None:
+                conn.host.close()
+
+    def _worker(self):
+        with self.app.app_context():
+            conn = None
+            while True:
+                try:
+                    msg, encolado = self.cola.get(timeout=self.idle if conn else None)
+                except eventlet.queue.Empty:
+                    self._cerrar(conn)  # el proveedor corta las conexiones ociosas igual
+                    conn = None
+                    continue
+
+                for intento in range(self.reintentos + 1):
+                    self.limite.esperar()
+                    try:
+                        # TimeoutError es OSError: se reintenta como cualquier error de red
+                        with eventlet.Timeout(self.timeout, TimeoutError(f"SMTP sin respuesta en {self.timeout}s")):
+                            if conn is None:
+                                conn = self.mail.connect().__enter__()
+                                self.conexiones += 1
+                            conn.send(msg)
+                    except (smtplib.SMTPException, OSError) as e:
+                        self.ultimo_error = f"{type(e).__name__}: {e}"
+                        if conn is not None:
+                            self._cerrar(conn)
+                            conn = None
+                        # errores permanentes (5xx) no se reintentan
+                        if _permanente(e):
+                            self.fallidos += 1
+                            print("❌ Correo rechazado:", self.ultimo_error)
+                            break
+                        if intento == self.reintentos:
+                            self.fallidos += 1
+                            print("❌ Correo no enviado tras reintentos:", self.ultimo_error)
+                            break
+                        self.reintentados += 1
+                        eventlet.sleep(self.backoff * 2 ** intento)
+                    except Exception as e:
+                        # mensaje inválido (BadHeaderError, sin remitente...): reintentar no
+                        # sirve, y el worker tiene que seguir vivo para el resto de la cola
+                        self.ultimo_error = f"{type(e).__name__}: {e}"
+                        self.fallidos += 1
+                        if conn is not None:
+                            self._cerrar(conn)
+                            conn = None
+                        print("❌ Correo descartado:", self.ultimo_error)
+                        break
+                    else:
+                        self.enviados += 1
+                        self.latencia_total += time.monotonic() - encolado
+                        break
+
+    def stats(self):
+        return {
+            "en_cola": self.cola.qsize(),
+            "encolados": self.encolados,
+            "enviados": self.enviados,
+            "fallidos": self.fallidos,
+            "reintentados": self.reintentados,
+            "conexiones": self.conexiones,
+            "latencia_media_s": round(self.latencia_total / self.enviados, 3) if self.enviados else 0.0,
+            "ultimo_error": self.ultimo_error,
+        }
@@ -0,0 +1,92 @@
+import time
+
+import eventlet
+import eventlet.queue
+
+
+class Difusor:
+    """Etapa entre los handlers y Flask-SocketIO.
+
+    En modo "lotes" los eventos se juntan durante `ventana` segundos (o hasta
+    `lote_max`) y salen como un único evento `lote` con la lista
+    [{evento, data}, ...]; si en la ventana hubo un solo evento se emite con
+    su nombre original. En modo "simple" cada evento se emite al momento.
+
+    Antes de cada envío se desconecta a los clientes cuya cola de salida
+    supera `cola_max`: un socket trabado no acumula memoria y al reconectar
+    recupera lo perdido por /api/pedidos y /api/comentarios.
+    """
+
+    def __init__(self, socketio, modo, ventana, lote_max, cola_max, observar=None):
+        self.socketio = socketio
+        self.observar = observar  # observar(segundos, evento) por cada emit
+        self.modo = modo
+        self.ventana = ventana
+        self.lote_max = lote_max
+        self.cola_max = cola_max
+        self.pendientes = []
+        self._temporizador = None
+        self.eventos = 0
+        self.envios = 0
+        self.lentos_desconectados = 0
+
+    def emitir(self, evento, data):
+        self.eventos += 1
+        if self.modo != "lotes":
+            self._recortar_lentos()
+            self._emit(evento, data)
+            return
+
+        self.pendientes.append({"evento": evento, "data": data})
+        if len(self.pendientes) >= self.lote_max:
+            if self._temporizador is not None:
+                self._temporizador.cancel()
+                self._temporizador = None
+            self.enviar()
+        elif self._temporizador is None:
+            self._temporizador = eventlet.spawn_after(self.ventana, self._al_vencer)
+
+    def _al_vencer(self):
+        self._temporizador = None
+        self.enviar()
+
+    def enviar(self):
+        lote, self.pendientes = self.pendientes, []
+        if not lote:
+            return
+        self._recortar_lentos()
+        evento, data = (lote[0]["evento"], lote[0]["data"]) if len(lote) == 1 else ("lote", lote)
+        self._emit(evento, data)
+
+    def _emit(self, evento, data):
+        self.envios += 1
+        t0 = time.perf_counter()
+        try:
+            self.socketio.emit(evento, data)
+        finally:
+            if self.observar is not None:
+                self.observar(time.perf_counter() - t0, evento)
+
+    def _recortar_lentos(self):
+        eio = self.socketio.server.eio
+        for sock in list(eio.sockets.values()):
+            if sock.closed or sock.queue.qsize() <= self.cola_max:
+                continue
+            # vaciamos la cola a mano: close() normal esperaría a que se drene
+            while True:
+                try:
+                    sock.queue.get_nowait()
+                    sock.queue.task_done()
+                except eventlet.queue.Empty:
+                    break
+            sock.close(wait=False, abort=True)
+            self.lentos_desconectados += 1
+
+    def stats(self):
+        return {
+            "modo": self.modo,
+            "eventos": self.eventos,
+            "envios": self.envios,
+            "pendientes": len(self.pendientes),
+            "lentos_desconectados": self.lentos_desconectados,
+        }
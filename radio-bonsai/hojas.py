@@ -0,0 +1,102 @@
+"""Lectura liviana de hojas de cálculo (CSV y XLSX) solo con la stdlib.
+
+Reemplaza a pandas/openpyxl para leer la planilla del carrusel: la XLSX se
+recorre en streaming con iterparse y nunca se arma el documento completo.
+"""
+import csv
+import io
+import re
+import zipfile
+from xml.etree.ElementTree import iterparse
+
+_COLUMNA = re.compile(r"[A-Z]+")
+
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def _indice_columna(ref):
+    letras = _COLUMNA.match(ref).group(0)
+    indice = 0
+    for letra in letras:
+        indice = indice * 26 + (ord(letra) - 64)
+    return indice - 1
+
+
+def _strings_compartidos(zf):
+    if "xl/sharedStrings.xml" not in zf.namelist():
+        return []
+    strings = []
+    with zf.open("xl/sharedStrings.xml") as f:
+        partes = []
+        for _, elem in iterparse(f):
+            nombre = _local(elem.tag)
+            if nombre == "t":
+                partes.append(elem.text or "")
+            elif nombre == "si":
+                strings.append("".join(partes))
+                partes = []
+                elem.clear()
+    return strings
+
+
+def _primera_hoja(zf):
+    hojas = sorted(n for n in zf.namelist() if re.fullmatch(r"xl/worksheets/sheet\d+\.xml", n))
+    if "xl/worksheets/sheet1.xml" in hojas:
+        return "xl/worksheets/sheet1.xml"
+    if not hojas:
+        raise ValueError("El XLSX no tiene hojas")
+    return hojas[0]
+
+
+def filas_xlsx(contenido):
+    """Itera las filas de la primera hoja como listas de strings."""
+    with zipfile.ZipFile(io.BytesIO(contenido)) as zf:
+        compartidos = _strings_compartidos(zf)
+        with zf.open(_primera_hoja(zf)) as f:
+            fila = {}
+            celda_ref = celda_tipo = None
+            valor = None
+            for evento, elem in iterparse(f, events=("start", "end")):
+                nombre = _local(elem.tag)
+                if evento == "start":
+                    if nombre == "c":
+                        celda_ref = elem.get("r")
+                        celda_tipo = elem.get("t")
+                        valor = None
+                    continue
+
+                if nombre in ("v", "t") and celda_ref is not None:
+                    valor = (valor or "") + (elem.text or "")
+                elif nombre == "c":
+                    if valor is not None:
+                        if celda_tipo == "s":
+                            valor = compartidos[int(valor)]
+                        fila[_indice_columna(celda_ref)] = valor
+                    celda_ref = None
+                elif nombre == "row":
+                    if fila:
+                        yield [fila.get(i, "") for i in range(max(fila) + 1)]
+                    fila = {}
+                    elem.clear()
+
+
+def filas_csv(contenido):
+    texto = contenido.decode("utf-8-sig", errors="replace")
+    yield from csv.reader(io.StringIO(texto))
+
+
+def leer_columna(contenido, columna, tipo="xlsx"):
+    """Valores no vacíos de `columna` (buscada por encabezado, sin espacios)."""
+    filas = filas_csv(contenido) if tipo == "csv" else filas_xlsx(contenido)
+    encabezado = None
+    for fila in filas:
+        if encabezado is None:
+            encabezado = [c.strip() for c in fila]
+            if columna not in encabezado:
+                raise ValueError(f"Columnas disponibles: {encabezado}")
+            indice = encabezado.index(columna)
+            continue
+        if indice < len(fila) and fila[indice].strip():
+            yield fila[indice]
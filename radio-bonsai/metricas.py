@@ -0,0 +1,229 @@
+import sys
+import time
+import traceback
+from collections import deque
+from contextlib import contextmanager
+
+import eventlet
+from eventlet import patcher
+
+# Las métricas se actualizan también desde hilos reales (tpool y el vigilante
+# del hub): se protegen con locks del sistema, no con los verdes de eventlet.
+_threading = patcher.original("threading")
+_thread = patcher.original("_thread")
+_time = patcher.original("time")
+
+# segundos; sirven tanto para requests como para consultas y emits
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _etiquetas(nombres, valores, extra=None):
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _numero(valor):
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class _Metrica:
+    tipo = None
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._lock = _threading.Lock()
+        self._valores = {}
+
+    def _encabezado(self):
+        return [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def inc(self, *valores, n=1):
+        with self._lock:
+            self._valores[valores] = self._valores.get(valores, 0) + n
+
+    def exponer(self):
+        lineas = self._encabezado()
+        with self._lock:
+            items = sorted(self._valores.items())
+        for valores, total in items:
+            lineas.append(f"{self.nombre}{_etiquetas(self.etiquetas, valores)} {_numero(total)}")
+        return lineas
+
+
+class Medidor(_Metrica):
+    """Gauge; con `funcion` el valor se lee al exponer (sin etiquetas)."""
+
+    tipo = "gauge"
+
+    def __init__(self, nombre, ayuda, etiquetas=(), funcion=None):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.funcion = funcion
+
+    def set(self, valor, *valores):
+        with self._lock:
+            self._valores[valores] = valor
+
+    def exponer(self):
+        lineas = self._encabezado()
+        if self.funcion is not None:
+            try:
+                lineas.append(f"{self.nombre} {_numero(self.funcion())}")
+            except Exception:
+                pass  # una métrica rota no tumba /metrics
+            return lineas
+        with self._lock:
+            items = sorted(self._valores.items())
+        for valores, valor in items:
+            lineas.append(f"{self.nombre}{_etiquetas(self.etiquetas, valores)} {_numero(valor)}")
+        return lineas
+
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.buckets = tuple(buckets)
+
+    def observar(self, segundos, *valores):
+        with self._lock:
+            serie = self._valores.get(valores)
+            if serie is None:
+                # [conteo por bucket (no acumulado)..., +Inf, suma]
+                serie = self._valores[valores] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, limite in enumerate(self.buckets):
+                if segundos <= limite:
+                    serie[i] += 1
+                    break
+            else:
+                serie[len(self.buckets)] += 1
+            serie[-1] += segundos
+
+    @contextmanager
+    def medir(self, *valores):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - t0, *valores)
+
+    def exponer(self):
+        lineas = self._encabezado()
+        with self._lock:
+            items = sorted((valores, list(serie)) for valores, serie in self._valores.items())
+        for valores, serie in items:
+            acumulado = 0
+            for limite, n in zip(self.buckets + (float("inf"),), serie):
+                acumulado += n
+                le = f'le="{_numero(limite)}"'
+                lineas.append(f"{self.nombre}_bucket{_etiquetas(self.etiquetas, valores, le)} {acumulado}")
+            etiquetas = _etiquetas(self.etiquetas, valores)
+            lineas.append(f"{self.nombre}_sum{etiquetas} {_numero(serie[-1])}")
+            lineas.append(f"{self.nombre}_count{etiquetas} {acumulado}")
+        return lineas
+
+
+class Registro:
+    """Conjunto de métricas expuesto en formato texto de Prometheus."""
+
+    def __init__(self):
+        self.metricas = []
+
+    def _agregar(self, metrica):
+        self.metricas.append(metrica)
+        return metrica
+
+    def contador(self, nombre, ayuda, etiquetas=()):
+        return self._agregar(Contador(nombre, ayuda, etiquetas))
+
+    def medidor(self, nombre, ayuda, etiquetas=(), funcion=None):
+        return self._agregar(Medidor(nombre, ayuda, etiquetas, funcion))
+
+    def histograma(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS):
+        return self._agregar(Histograma(nombre, ayuda, etiquetas, buckets))
+
+    def exponer(self):
+        lineas = []
+        for metrica in self.metricas:
+            lineas.extend(metrica.exponer())
+        return "\n".join(lineas) + "\n"
+
+
+class VigilanteHub:
+    """Detecta cuándo algo retiene el hub de eventlet más de `umbral` segundos.
+
+    Un greenlet late cada `intervalo` y anota cuándo despertó; un hilo real
+    revisa ese latido y, si se atrasó más del umbral, captura la pila del
+    hilo del hub en ese momento (lo que está bloqueando). Se guarda una
+    captura por bloqueo en `capturas`; la pila solo va al log, `stats()` es
+    público (/stats) y no la expone.
+    """
+
+    def __init__(self, registro, umbral=0.1, intervalo=0.05, capturas=20):
+        self.umbral = umbral
+        self.intervalo = intervalo
+        self.capturas = deque(maxlen=capturas)
+        self.bloqueos = registro.contador(
+            "radio_hub_bloqueos_total", f"Veces que el hub estuvo bloqueado más de {umbral}s")
+        self.retraso = registro.histograma(
+            "radio_hub_retraso_segundos", "Retraso con el que despierta un greenlet que duerme")
+        self._ultimo_latido = None  # hasta el primer latido no se vigila
+        self._capturado = False
+        self._hilo_hub = None
+        self._hilo = None
+
+    def _latir(self):
+        while True:
+            t0 = time.monotonic()
+            eventlet.sleep(self.intervalo)
+            ahora = time.monotonic()
+            self.retraso.observar(max(0.0, ahora - t0 - self.intervalo))
+            self._ultimo_latido = ahora
+            self._capturado = False
+
+    def _vigilar(self):
+        while True:
+            _time.sleep(self.intervalo)
+            if self._ultimo_latido is None:
+                continue
+            atraso = time.monotonic() - self._ultimo_latido
+            if atraso <= self.umbral + self.intervalo or self._capturado:
+                continue
+            self._capturado = True  # una captura por bloqueo
+            frame = sys._current_frames().get(self._hilo_hub)
+            pila = "".join(traceback.format_stack(frame)) if frame is not None else ""
+            self.bloqueos.inc()
+            self.capturas.append({
+                "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "atraso_s": round(atraso, 3),
+                "pila": pila,
+            })
+            print(f"⚠️ Hub bloqueado {atraso:.3f}s en:\n{pila}")
+
+    def iniciar(self):
+        # se llama desde el hilo del hub (el principal)
+        if self._hilo is None:
+            self._hilo_hub = _thread.get_ident()
+            eventlet.spawn(self._latir)
+            self._hilo = _threading.Thread(target=self._vigilar, name="vigilante-hub", daemon=True)
+            self._hilo.start()
+
+    def stats(self):
+        return {
+            "umbral_s": self.umbral,
+            "capturas": [{"fecha": c["fecha"], "atraso_s": c["atraso_s"]} for c in self.capturas],
+        }
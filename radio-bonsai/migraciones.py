@@ -0,0 +1,190 @@
+"""Migraciones versionadas de Postgres (usuarios) y SQLite (pedidos/comentarios).
+
+Cada migración es (versión, nombre, [sentencias]) y se aplica una sola vez;
+las aplicadas quedan registradas en `schema_migrations`. Para agregar una
+nueva, sumarla al final de la lista con la versión siguiente.
+
+    flask --app app migrar
+"""
+from datetime import datetime
+
+MIGRACIONES_POSTGRES = [
+    (1, "esquema inicial", [
+        """
+        CREATE TABLE IF NOT EXISTS usuarios (
+            id SERIAL PRIMARY KEY,
+            username TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS reset_tokens (
+            id SERIAL PRIMARY KEY,
+            user_id INT REFERENCES usuarios(id),
+            token TEXT UNIQUE NOT NULL,
+            expiracion TIMESTAMP NOT NULL
+        )
+        """,
+    ]),
+    (2, "indices de login y expiración de tokens", [
+        # login() busca por username
+        "CREATE INDEX IF NOT EXISTS idx_usuarios_username ON usuarios(username)",
+        # purga periódica de tokens vencidos
+        "CREATE INDEX IF NOT EXISTS idx_reset_tokens_expiracion ON reset_tokens(expiracion)",
+        # la FK no crea índice en Postgres
+        "CREATE INDEX IF NOT EXISTS idx_reset_tokens_user_id ON reset_tokens(user_id)",
+    ]),
+]
+
+MIGRACIONES_SQLITE = [
+    (1, "esquema inicial", [
+        """
+        CREATE TABLE IF NOT EXISTS pedidos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre TEXT NOT NULL,
+            cancion TEXT NOT NULL,
+            dedicatoria TEXT,
+            artista TEXT,
+            fecha_hora TIMESTAMP NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS comentarios (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre TEXT NOT NULL,
+            mensaje TEXT NOT NULL,
+            imagen TEXT,
+            fecha_hora TIMESTAMP NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_pedidos_fecha ON pedidos(fecha_hora DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_comentarios_fecha ON comentarios(fecha_hora DESC)",
+    ]),
+    (2, "indice de imagenes de comentarios", [
+        # la retención lista las imágenes en uso: índice parcial y cubriente
+        "CREATE INDEX IF NOT EXISTS idx_comentarios_imagen ON comentarios(imagen) WHERE imagen IS NOT NULL",
+    ]),
+    (3, "ranking por hora", [
+        # conteos de pedidos por canción/artista normalizados y por hora;
+        # se actualiza en el mismo lote que el INSERT del pedido
+        """
+        CREATE TABLE IF NOT EXISTS ranking_horas (
+            hora INTEGER NOT NULL,
+            tipo TEXT NOT NULL,
+            clave TEXT NOT NULL,
+            nombre TEXT NOT NULL,
+            conteo INTEGER NOT NULL,
+            PRIMARY KEY (tipo, clave, hora)
+        ) WITHOUT ROWID
+        """,
+        # carga de las últimas horas al arrancar y purga de las viejas
+        "CREATE INDEX IF NOT EXISTS idx_ranking_horas_hora ON ranking_horas(hora)",
+    ]),
+    (4, "busqueda de pedidos", [
+        # índice FTS5 externo: no duplica el texto, lo mantienen los triggers
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS pedidos_fts USING fts5(
+            cancion, artista, dedicatoria,
+            content='pedidos', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS pedidos_fts_ai AFTER INSERT ON pedidos BEGIN
+            INSERT INTO pedidos_fts(rowid, cancion, artista, dedicatoria)
+            VALUES (new.id, new.cancion, new.artista, new.dedicatoria);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS pedidos_fts_ad AFTER DELETE ON pedidos BEGIN
+            INSERT INTO pedidos_fts(pedidos_fts, rowid, cancion, artista, dedicatoria)
+            VALUES ('delete', old.id, old.cancion, old.artista, old.dedicatoria);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS pedidos_fts_au AFTER UPDATE ON pedidos BEGIN
+            INSERT INTO pedidos_fts(pedidos_fts, rowid, cancion, artista, dedicatoria)
+            VALUES ('delete', old.id, old.cancion, old.artista, old.dedicatoria);
+            INSERT INTO pedidos_fts(rowid, cancion, artista, dedicatoria)
+            VALUES (new.id, new.cancion, new.artista, new.dedicatoria);
+        END
+        """,
+        # indexa los pedidos que ya existían
+        "INSERT INTO pedidos_fts(pedidos_fts) VALUES ('rebuild')",
+    ]),
+]
+
+TABLA_POSTGRES = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        nombre TEXT NOT NULL,
+        aplicada TIMESTAMP NOT NULL
+    )
+"""
+TABLA_SQLITE = TABLA_POSTGRES
+
+# clave arbitraria para pg_advisory_xact_lock: un solo worker migra a la vez
+LOCK_MIGRACIONES = 724001
+
+
+def pendientes(aplicadas, migraciones):
+    return [m for m in migraciones if m[0] not in aplicadas]
+
+
+def migrar_postgres(conn):
+    """Aplica las migraciones pendientes en una transacción; devuelve las versiones aplicadas."""
+    with conn.cursor() as cur:
+        # chequeo barato sin lock: en el arranque normal no hay nada pendiente
+        cur.execute("SELECT to_regclass('schema_migrations')")
+        if cur.fetchone()[0] is not None:
+            cur.execute("SELECT version FROM schema_migrations")
+            if not pendientes({r[0] for r in cur.fetchall()}, MIGRACIONES_POSTGRES):
+                conn.commit()
+                return []
+
+        cur.execute("SELECT pg_advisory_xact_lock(%s)", (LOCK_MIGRACIONES,))
+        cur.execute(TABLA_POSTGRES)
+        cur.execute("SELECT version FROM schema_migrations")
+        aplicadas = []
+        for version, nombre, sentencias in pendientes({r[0] for r in cur.fetchall()}, MIGRACIONES_POSTGRES):
+            for sql in sentencias:
+                cur.execute(sql)
+            cur.execute(
+                "INSERT INTO schema_migrations (version, nombre, aplicada) VALUES (%s, %s, %s)",
+                (version, nombre, datetime.utcnow())
+            )
+            aplicadas.append(version)
+    conn.commit()
+    return aplicadas
+
+
+def migrar_sqlite(conn):
+    """Igual que `migrar_postgres`; `conn` debe estar en modo autocommit (isolation_level=None)."""
+    existe = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_migrations'"
+    ).fetchone()
+    if existe:
+        hechas = {r[0] for r in conn.execute("SELECT version FROM schema_migrations")}
+        if not pendientes(hechas, MIGRACIONES_SQLITE):
+            return []
+
+    conn.execute("BEGIN IMMEDIATE")  # serializa con otros procesos que arranquen a la vez
+    try:
+        conn.execute(TABLA_SQLITE)
+        hechas = {r[0] for r in conn.execute("SELECT version FROM schema_migrations")}
+        aplicadas = []
+        for version, nombre, sentencias in pendientes(hechas, MIGRACIONES_SQLITE):
+            for sql in sentencias:
+                conn.execute(sql)
+            conn.execute(
+                "INSERT INTO schema_migrations (version, nombre, aplicada) VALUES (?, ?, ?)",
+                (version, nombre, datetime.utcnow().isoformat(' '))
+            )
+            aplicadas.append(version)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return aplicadas
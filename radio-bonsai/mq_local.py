@@ -0,0 +1,167 @@
+"""Broker pub/sub mínimo para repartir emits de Socket.IO entre procesos.
+
+Sirve como reemplazo local de Redis/RabbitMQ para probar varios workers
+en una sola máquina. No persiste nada: reenvía cada mensaje a todos los
+suscriptores conectados.
+
+    python mq_local.py --host 127.0.0.1 --port 5555
+
+y en cada worker:
+
+    SOCKETIO_MESSAGE_QUEUE=local://127.0.0.1:5555
+"""
+import argparse
+import json
+import socket
+import struct
+from urllib.parse import urlsplit
+
+import eventlet
+import eventlet.queue
+import eventlet.semaphore
+from socketio import PubSubManager
+
+CABECERA = struct.Struct("!I")  # largo del mensaje, big-endian
+SUSCRIBIR = b"SUSCRIBIR"
+
+
+def enviar_frame(sock, payload):
+    sock.sendall(CABECERA.pack(len(payload)) + payload)
+
+
+def leer_frame(archivo):
+    cabecera = archivo.read(CABECERA.size)
+    if len(cabecera) < CABECERA.size:
+        return None
+    (largo,) = CABECERA.unpack(cabecera)
+    payload = archivo.read(largo)
+    if len(payload) < largo:
+        return None
+    return payload
+
+
+class LocalBroker:
+    """Reenvía cada frame publicado a todos los suscriptores.
+
+    Un cliente que envía el frame `SUSCRIBIR` pasa a ser suscriptor;
+    el resto de los frames de cualquier cliente son publicaciones. Cada
+    suscriptor tiene su propia cola, así uno lento no frena a los demás.
+    """
+
+    def __init__(self, host="127.0.0.1", port=5555):
+        self.host = host
+        self.port = port
+        self.suscriptores = {}  # socket -> cola de salida
+        self.mensajes = 0
+
+    def _escribir(self, sock, cola):
+        try:
+            while True:
+                payload = cola.get()
+                if payload is None:
+                    break
+                enviar_frame(sock, payload)
+        except OSError:
+            pass
+        finally:
+            self.suscriptores.pop(sock, None)
+
+    def _atender(self, sock):
+        archivo = sock.makefile("rb")
+        try:
+            while True:
+                payload = leer_frame(archivo)
+                if payload is None:
+                    break
+                if payload == SUSCRIBIR:
+                    cola = eventlet.queue.LightQueue()
+                    self.suscriptores[sock] = cola
+                    eventlet.spawn_n(self._escribir, sock, cola)
+                    continue
+                self.mensajes += 1
+                for cola in list(self.suscriptores.values()):
+                    cola.put(payload)
+        finally:
+            cola = self.suscriptores.pop(sock, None)
+            if cola is not None:
+                cola.put(None)
+            sock.close()
+
+    def servir(self, listo=None):
+        servidor = eventlet.listen((self.host, self.port))
+        self.port = servidor.getsockname()[1]
+        if listo is not None:
+            listo.send(self.port)
+        pool = eventlet.GreenPool()
+        while True:
+            sock, _ = servidor.accept()
+            pool.spawn_n(self._atender, sock)
+
+
+class LocalManager(PubSubManager):
+    """Client manager de python-socketio sobre `LocalBroker`.
+
+    Los mensajes viajan como JSON con el canal incluido, así varios
+    despliegues pueden compartir el mismo broker.
+    """
+
+    name = "local"
+
+    def __init__(self, url="local://127.0.0.1:5555", channel="socketio",
+                 write_only=False, logger=None):
+        partes = urlsplit(url)
+        self.direccion = (partes.hostname or "127.0.0.1", partes.port or 5555)
+        self._sock = None
+        self._lock = eventlet.semaphore.Semaphore()  # un frame a la vez por socket
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+
+    def _conectar(self):
+        sock = socket.create_connection(self.direccion)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def _publish(self, data):
+        payload = json.dumps({"canal": self.channel, "data": data}).encode()
+        with self._lock:
+            for intento in range(2):
+                try:
+                    if self._sock is None:
+                        self._sock = self._conectar()
+                    enviar_frame(self._sock, payload)
+                    return
+                except OSError:
+                    self._sock = None
+                    if intento:
+                        raise
+
+    def _listen(self):
+        while True:
+            try:
+                sock = self._conectar()
+            except OSError:
+                self._get_logger().warning("Broker local no disponible, reintentando")
+                eventlet.sleep(1)
+                continue
+            archivo = sock.makefile("rb")
+            try:
+                enviar_frame(sock, SUSCRIBIR)
+                while True:
+                    payload = leer_frame(archivo)
+                    if payload is None:
+                        break
+                    mensaje = json.loads(payload)
+                    if mensaje.get("canal") == self.channel:
+                        yield mensaje["data"]
+            finally:
+                sock.close()
+            eventlet.sleep(1)
+
+
+if __name__ == "__main__":
+    eventlet.monkey_patch()
+    parser = argparse.ArgumentParser(description="Broker pub/sub local para Socket.IO")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5555)
+    args = parser.parse_args()
+    print(f"📡 Broker local escuchando en {args.host}:{args.port}")
+    LocalBroker(args.host, args.port).servir()
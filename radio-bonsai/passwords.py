@@ -0,0 +1,70 @@
+import time
+
+import eventlet.semaphore
+from eventlet import tpool
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# Lo mismo que usa Werkzeug por defecto, pero explícito para poder compararlo
+METODO_POR_DEFECTO = "scrypt:32768:8:1"
+
+
+class PasswordHasher:
+    """Hashea y verifica contraseñas en hilos reales (eventlet.tpool).
+
+    scrypt/pbkdf2 son CPU puro y liberan el GIL, así que en un hilo no
+    congelan el hub. Un semáforo limita cuántos hashes corren a la vez;
+    el resto espera en cola (`en_cola`).
+    """
+
+    def __init__(self, concurrencia=2, metodo=METODO_POR_DEFECTO):
+        self.metodo = metodo
+        self._prefijo = None  # forma canónica de `metodo`, ver necesita_rehash
+        self.concurrencia = concurrencia
+        self._sem = eventlet.semaphore.Semaphore(concurrencia)
+        self.en_cola = 0
+        self.en_curso = 0
+        self.cola_max = 0
+        self.hashes = 0
+        self.tiempo_total = 0.0
+
+    def _ejecutar(self, fn, *args):
+        self.en_cola += 1
+        self.cola_max = max(self.cola_max, self.en_cola)
+        try:
+            self._sem.acquire()
+        finally:
+            self.en_cola -= 1
+        self.en_curso += 1
+        t0 = time.perf_counter()
+        try:
+            return tpool.execute(fn, *args)
+        finally:
+            self.tiempo_total += time.perf_counter() - t0
+            self.hashes += 1
+            self.en_curso -= 1
+            self._sem.release()
+
+    def generar(self, password):
+        return self._ejecutar(generate_password_hash, password, self.metodo)
+
+    def verificar(self, password_hash, password):
+        return self._ejecutar(check_password_hash, password_hash, password)
+
+    def necesita_rehash(self, password_hash):
+        # el hash guardado empieza con los parámetros: "scrypt:32768:8:1$sal$hash".
+        # HASH_METODO puede venir abreviado ("scrypt", "pbkdf2:sha256"), así que
+        # se compara con el prefijo de un hash real, calculado una sola vez
+        if self._prefijo is None:
+            self._prefijo = self.generar("rehash").split("$", 1)[0]
+        return password_hash.split("$", 1)[0] != self._prefijo
+
+    def stats(self):
+        return {
+            "metodo": self.metodo,
+            "concurrencia": self.concurrencia,
+            "en_cola": self.en_cola,
+            "en_curso": self.en_curso,
+            "cola_max": self.cola_max,
+            "hashes": self.hashes,
+            "tiempo_medio_ms": round(self.tiempo_total / self.hashes * 1000, 2) if self.hashes else 0.0,
+        }
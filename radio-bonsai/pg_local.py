@@ -0,0 +1,248 @@
+"""Postgres mínimo en memoria, para pruebas de carga sin un servidor real.
+
+Habla lo justo del protocolo v3 (startup sin contraseña y consultas
+simples, que es lo que usa psycopg2) y entiende solo las consultas que hace
+app.py sobre `usuarios`, `reset_tokens` y `schema_migrations`. Las
+migraciones se dan por aplicadas.
+
+    python pg_local.py --port 5433
+
+y en la app:
+
+    DATABASE_URL=postgresql://radio@127.0.0.1:5433/radio?sslmode=disable
+"""
+import argparse
+import re
+import struct
+from datetime import datetime
+
+import eventlet
+
+from migraciones import MIGRACIONES_POSTGRES
+
+SSL_REQUEST = 80877103
+GSSENC_REQUEST = 80877104
+
+# oid de tipo por nombre de columna; el resto va como text
+TIPOS = {"id": 23, "user_id": 23, "version": 23, "expiracion": 1114}
+LITERAL = re.compile(r"'((?:[^']|'')*)'(?:::[\w ]+)?|(-?\d+)")
+
+
+def _literales(sql):
+    return [s.replace("''", "'") if n == "" else int(n) for s, n in LITERAL.findall(sql)]
+
+
+def _mensaje(tipo, cuerpo=b""):
+    return tipo + struct.pack("!i", len(cuerpo) + 4) + cuerpo
+
+
+def _cstr(texto):
+    return str(texto).encode() + b"\0"
+
+
+class ErrorSQL(Exception):
+    def __init__(self, codigo, mensaje):
+        super().__init__(mensaje)
+        self.codigo = codigo
+
+
+class PostgresLocal:
+    def __init__(self, host="127.0.0.1", port=5433, verbose=False):
+        self.host = host
+        self.port = port
+        self.verbose = verbose
+        self.usuarios = {}  # id -> [id, username, email, password]
+        self.tokens = {}  # token -> [user_id, expiracion]
+        self.consultas = 0
+        self.conexiones = 0
+        self._siguiente_id = 1
+
+    # --- consultas ---
+    def _consultar(self, sql):
+        """Devuelve (columnas, filas, tag)."""
+        plano = " ".join(sql.split())
+        upper = plano.upper()
+        palabra = upper.split(" ", 1)[0] if upper else ""
+
+        if palabra in ("BEGIN", "START"):
+            return None, None, "BEGIN"
+        if palabra in ("COMMIT", "END"):
+            return None, None, "COMMIT"
+        if palabra in ("ROLLBACK", "ABORT"):
+            return None, None, "ROLLBACK"
+        if palabra in ("SET", "CREATE", "ALTER", "SAVEPOINT", "RELEASE"):
+            return None, None, palabra
+        if palabra == "SHOW":
+            return ["valor"], [[""]], "SHOW"
+
+        if "TO_REGCLASS" in upper:
+            return ["to_regclass"], [["schema_migrations"]], "SELECT 1"
+        if "PG_ADVISORY" in upper:
+            return ["pg_advisory_xact_lock"], [[""]], "SELECT 1"
+        if upper.startswith("SELECT VERSION FROM SCHEMA_MIGRATIONS"):
+            filas = [[m[0]] for m in MIGRACIONES_POSTGRES]
+            return ["version"], filas, f"SELECT {len(filas)}"
+        if upper == "SELECT 1":
+            return ["?column?"], [[1]], "SELECT 1"
+
+        valores = _literales(plano)
+        if upper.startswith("INSERT INTO USUARIOS"):
+            username, email, password = valores[-3:]
+            if any(u[2] == email for u in self.usuarios.values()):
+                raise ErrorSQL("23505", "duplicate key value violates unique constraint \"usuarios_email_key\"")
+            self.usuarios[self._siguiente_id] = [self._siguiente_id, username, email, password]
+            self._siguiente_id += 1
+            return None, None, "INSERT 0 1"
+        if upper.startswith("SELECT ID, USERNAME, EMAIL, PASSWORD FROM USUARIOS WHERE USERNAME"):
+            filas = [list(u) for u in self.usuarios.values() if u[1] == valores[-1]][:1]
+            return ["id", "username", "email", "password"], filas, f"SELECT {len(filas)}"
+        if upper.startswith("SELECT ID FROM USUARIOS WHERE EMAIL"):
+            filas = [[u[0]] for u in self.usuarios.values() if u[2] == valores[-1]][:1]
+            return ["id"], filas, f"SELECT {len(filas)}"
+        if upper.startswith("UPDATE USUARIOS SET PASSWORD"):
+            password, user_id = valores[-2:]
+            if user_id in self.usuarios:
+                self.usuarios[user_id][3] = password
+                return None, None, "UPDATE 1"
+            return None, None, "UPDATE 0"
+        if upper.startswith("INSERT INTO RESET_TOKENS"):
+            user_id, token, expiracion = valores[-3:]
+            self.tokens[token] = [user_id, datetime.fromisoformat(expiracion)]
+            return None, None, "INSERT 0 1"
+        if upper.startswith("SELECT USER_ID, EXPIRACION FROM RESET_TOKENS WHERE TOKEN"):
+            fila = self.tokens.get(valores[-1])
+            filas = [list(fila)] if fila else []
+            return ["user_id", "expiracion"], filas, f"SELECT {len(filas)}"
+        if upper.startswith("DELETE FROM RESET_TOKENS WHERE TOKEN"):
+            return None, None, f"DELETE {int(self.tokens.pop(valores[-1], None) is not None)}"
+        if upper.startswith("DELETE FROM RESET_TOKENS"):
+            # purga de vencidos: el primer literal es la fecha de corte
+            corte = datetime.fromisoformat(valores[0])
+            vencidos = [t for t, (_, expiracion) in self.tokens.items() if expiracion < corte]
+            for token in vencidos:
+                del self.tokens[token]
+            return None, None, f"DELETE {len(vencidos)}"
+        if palabra in ("DELETE", "UPDATE"):
+            return None, None, f"{palabra} 0"
+        if palabra == "INSERT":
+            return None, None, "INSERT 0 1"
+        raise ErrorSQL("0A000", f"pg_local no entiende: {plano[:80]}")
+
+    # --- protocolo ---
+    def _respuesta(self, columnas, filas, tag):
+        partes = []
+        if columnas is not None:
+            descripcion = struct.pack("!h", len(columnas))
+            for nombre in columnas:
+                tipo = TIPOS.get(nombre, 25)
+                descripcion += _cstr(nombre) + struct.pack("!ihihih", 0, 0, tipo, -1, -1, 0)
+            partes.append(_mensaje(b"T", descripcion))
+            for fila in filas:
+                datos = struct.pack("!h", len(fila))
+                for valor in fila:
+                    if valor is None:
+                        datos += struct.pack("!i", -1)
+                    else:
+                        b = str(valor).encode()
+                        datos += struct.pack("!i", len(b)) + b
+                partes.append(_mensaje(b"D", datos))
+        partes.append(_mensaje(b"C", _cstr(tag)))
+        return b"".join(partes)
+
+    def _error(self, e):
+        cuerpo = b"SERROR\0VERROR\0C" + _cstr(e.codigo) + b"M" + _cstr(e) + b"\0"
+        return _mensaje(b"E", cuerpo)
+
+    def _leer(self, archivo, n):
+        datos = archivo.read(n)
+        if len(datos) < n:
+            raise EOFError
+        return datos
+
+    def _atender(self, sock):
+        self.conexiones += 1
+        archivo = sock.makefile("rwb")
+        try:
+            # SSLRequest / GSSENCRequest: no soportados, se sigue en claro
+            while True:
+                largo, codigo = struct.unpack("!ii", self._leer(archivo, 8))
+                if codigo in (SSL_REQUEST, GSSENC_REQUEST):
+                    archivo.write(b"N")
+                    archivo.flush()
+                    continue
+                self._leer(archivo, largo - 8)  # parámetros de startup
+                break
+
+            inicio = [_mensaje(b"R", struct.pack("!i", 0))]
+            for nombre, valor in (
+                ("server_version", "16.0"), ("server_encoding", "UTF8"), ("client_encoding", "UTF8"),
+                ("DateStyle", "ISO, MDY"), ("TimeZone", "UTC"), ("integer_datetimes", "on"),
+                ("standard_conforming_strings", "on"),
+            ):
+                inicio.append(_mensaje(b"S", _cstr(nombre) + _cstr(valor)))
+            inicio.append(_mensaje(b"K", struct.pack("!ii", self.conexiones, 0)))
+            inicio.append(_mensaje(b"Z", b"I"))
+            archivo.write(b"".join(inicio))
+            archivo.flush()
+
+            estado = b"I"
+            while True:
+                tipo = self._leer(archivo, 1)
+                largo, = struct.unpack("!i", self._leer(archivo, 4))
+                cuerpo = self._leer(archivo, largo - 4)
+                if tipo == b"X":
+                    break
+                if tipo != b"Q":
+                    archivo.write(self._error(ErrorSQL("0A000", "solo consultas simples")) + _mensaje(b"Z", estado))
+                    archivo.flush()
+                    continue
+
+                sql = cuerpo.rstrip(b"\0").decode()
+                self.consultas += 1
+                if self.verbose:
+                    print("🐘", " ".join(sql.split())[:120])
+                if not sql.strip():
+                    archivo.write(_mensaje(b"I") + _mensaje(b"Z", estado))
+                    archivo.flush()
+                    continue
+                if estado == b"E" and sql.strip().upper() not in ("ROLLBACK", "ABORT"):
+                    respuesta = self._error(ErrorSQL("25P02", "current transaction is aborted"))
+                else:
+                    try:
+                        columnas, filas, tag = self._consultar(sql)
+                        respuesta = self._respuesta(columnas, filas, tag)
+                        if tag == "BEGIN":
+                            estado = b"T"
+                        elif tag in ("COMMIT", "ROLLBACK"):
+                            estado = b"I"
+                    except ErrorSQL as e:
+                        respuesta = self._error(e)
+                        if estado == b"T":
+                            estado = b"E"
+                archivo.write(respuesta + _mensaje(b"Z", estado))
+                archivo.flush()
+        except (EOFError, OSError, struct.error):
+            pass
+        finally:
+            sock.close()
+
+    def servir(self, listo=None):
+        servidor = eventlet.listen((self.host, self.port))
+        self.port = servidor.getsockname()[1]
+        if listo is not None:
+            listo.send(self.port)
+        pool = eventlet.GreenPool()
+        while True:
+            sock, _ = servidor.accept()
+            pool.spawn_n(self._atender, sock)
+
+
+if __name__ == "__main__":
+    eventlet.monkey_patch()
+    parser = argparse.ArgumentParser(description="Postgres local en memoria para pruebas")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5433)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    print(f"🐘 Postgres local escuchando en {args.host}:{args.port}")
+    PostgresLocal(args.host, args.port, args.verbose).servir()
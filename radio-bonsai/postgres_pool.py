@@ -0,0 +1,172 @@
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import eventlet.semaphore
+import psycopg2
+import psycopg2.extensions
+
+from sqlite_store import operacion
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class CursorMedido(psycopg2.extensions.cursor):
+    observar = None
+
+    def execute(self, sql, params=None):
+        t0 = time.perf_counter()
+        try:
+            return super().execute(sql, params)
+        finally:
+            self.observar(time.perf_counter() - t0, operacion(sql))
+
+
+class ConexionMedida(psycopg2.extensions.connection):
+    """Conexión que reporta la duración de cada sentencia a `observar(segundos, operacion)`."""
+
+    observar = None
+
+    def cursor(self, *args, **kwargs):
+        cur = super().cursor(*args, **kwargs)
+        cur.observar = self.observar
+        return cur
+
+
+class PostgresPool:
+    """Pool de conexiones Postgres para greenlets (psycogreen).
+
+    Las conexiones se validan antes de reutilizarse si estuvieron ociosas y
+    se reciclan al superar `max_lifetime`.
+    """
+
+    def __init__(self, dsn, minconn, maxconn, timeout, max_lifetime, check_idle,
+                 observar=None, observar_espera=None):
+        self.dsn = dsn
+        # callbacks de métricas, como en SQLiteStore: observar(segundos, operacion)
+        # por sentencia, observar_espera(segundos) por cada préstamo de conexión
+        self.observar = observar
+        self.observar_espera = observar_espera
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.check_idle = check_idle
+        self._libres = deque()  # (conn, creada, ultimo_uso)
+        self._sem = eventlet.semaphore.Semaphore(maxconn)
+        self.abiertas = 0
+        self.en_uso = 0
+        self.esperando = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.descartadas = 0
+        self.espera_total = 0.0
+        self.espera_max = 0.0
+
+    def _conectar(self):
+        if self.observar is None:
+            conn = psycopg2.connect(self.dsn)
+        else:
+            conn = psycopg2.connect(self.dsn, connection_factory=ConexionMedida, cursor_factory=CursorMedido)
+            conn.observar = self.observar
+        self.abiertas += 1
+        return conn, time.monotonic()
+
+    def _cerrar(self, conn):
+        self.abiertas -= 1
+        self.descartadas += 1
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def _es_valida(self, conn, creada, ultimo_uso):
+        ahora = time.monotonic()
+        if conn.closed or ahora - creada > self.max_lifetime:
+            return False
+        if ahora - ultimo_uso > self.check_idle:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                conn.rollback()
+            except psycopg2.Error:
+                return False
+        return True
+
+    def _obtener(self):
+        while self._libres:
+            conn, creada, ultimo_uso = self._libres.pop()
+            if self._es_valida(conn, creada, ultimo_uso):
+                return conn, creada
+            self._cerrar(conn)
+        return self._conectar()
+
+    def _devolver(self, conn, creada):
+        if conn.closed or time.monotonic() - creada > self.max_lifetime:
+            self._cerrar(conn)
+            return
+        if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                self._cerrar(conn)
+                return
+        self._libres.append((conn, creada, time.monotonic()))
+
+    def llenar(self):
+        while self.abiertas < self.minconn:
+            conn, creada = self._conectar()
+            self._libres.append((conn, creada, creada))
+
+    @contextmanager
+    def connection(self):
+        t0 = time.monotonic()
+        self.esperando += 1
+        try:
+            ok = self._sem.acquire(timeout=self.timeout)
+        finally:
+            self.esperando -= 1
+        espera = time.monotonic() - t0
+        if self.observar_espera is not None:
+            self.observar_espera(espera)
+        self.espera_total += espera
+        self.espera_max = max(self.espera_max, espera)
+        if not ok:
+            self.timeouts += 1
+            raise PoolTimeout(f"Sin conexiones libres tras {self.timeout}s")
+
+        self.checkouts += 1
+        self.en_uso += 1
+        conn = None
+        try:
+            conn, creada = self._obtener()
+            # misma semántica que `with psycopg2.connect() as conn`
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                if not conn.closed:
+                    conn.rollback()
+                raise
+        finally:
+            if conn is not None:
+                self._devolver(conn, creada)
+            self.en_uso -= 1
+            self._sem.release()
+
+    def stats(self):
+        return {
+            "min": self.minconn,
+            "max": self.maxconn,
+            "abiertas": self.abiertas,
+            "libres": len(self._libres),
+            "en_uso": self.en_uso,
+            "esperando": self.esperando,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "descartadas": self.descartadas,
+            "espera_media_ms": round(self.espera_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            "espera_max_ms": round(self.espera_max * 1000, 3),
+        }
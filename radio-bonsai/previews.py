@@ -0,0 +1,137 @@
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+from urllib.parse import urlsplit, urlunsplit
+
+import eventlet
+import eventlet.queue
+import requests
+
+# bs4 se importa recién al usarse (ver extract_link_preview)
+
+
+def normalizar_url(url):
+    url = url.strip().rstrip('.,;:!?)"\'')
+    partes = urlsplit(url)
+    host = (partes.hostname or "").lower()
+    if partes.port and not ((partes.scheme == "http" and partes.port == 80) or
+                            (partes.scheme == "https" and partes.port == 443)):
+        host = f"{host}:{partes.port}"
+    return urlunsplit((partes.scheme.lower(), host, partes.path or "/", partes.query, ""))
+
+
+def leer_head(url, max_bytes, medir=nullcontext):
+    # lectura en streaming: cortamos en </head> o al llegar al límite de bytes
+    with medir(), requests.get(url, timeout=5, stream=True, headers={"Accept": "text/html"}) as r:
+        r.raise_for_status()
+        contenido = b""
+        for chunk in r.iter_content(chunk_size=4096):
+            contenido += chunk
+            if b"</head>" in contenido.lower() or len(contenido) >= max_bytes:
+                break
+        encoding = r.encoding or "utf-8"
+    return contenido[:max_bytes].decode(encoding, errors="replace")
+
+
+def extract_link_preview(url, max_bytes, medir=nullcontext):
+    from bs4 import BeautifulSoup
+
+    try:
+        html = leer_head(url, max_bytes, medir)
+        fin = html.lower().find("</head>")
+        soup = BeautifulSoup(html[:fin] if fin != -1 else html, "html.parser")
+        title = soup.find("title")
+        description = soup.find("meta", attrs={"name": "description"})
+        image = soup.find("meta", property="og:image")
+        return {
+            "title": title.text.strip() if title else url,
+            "description": description.get("content", "") if description else "",
+            "image": image.get("content", "") if image else "",
+            "url": url
+        }
+    except Exception:
+        return None
+
+
+class PreviewCache:
+    """LRU con TTL; los fallos (None) se guardan con un TTL más corto."""
+
+    def __init__(self, max_items, ttl, ttl_fallo):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.ttl_fallo = ttl_fallo
+        self._items = OrderedDict()
+
+    def get(self, key):
+        """Devuelve (encontrado, preview)."""
+        item = self._items.get(key)
+        if item is None:
+            return False, None
+        expira, preview = item
+        if time.monotonic() >= expira:
+            del self._items[key]
+            return False, None
+        self._items.move_to_end(key)
+        return True, preview
+
+    def set(self, key, preview):
+        ttl = self.ttl if preview is not None else self.ttl_fallo
+        self._items[key] = (time.monotonic() + ttl, preview)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+
+class PreviewService:
+    """Busca previews fuera del request, con un pool acotado de workers.
+
+    El comentario se guarda y se emite sin esperar; cuando la preview está
+    lista se emite `preview_comentario` para parchear el comentario ya enviado.
+    """
+
+    def __init__(self, workers, queue_max, cache, max_bytes, emitir, medir=nullcontext):
+        self.workers = workers
+        self.cache = cache
+        self.max_bytes = max_bytes
+        self.emitir = emitir  # emitir(evento, datos) hacia los clientes
+        self.medir = medir  # context manager alrededor de cada GET (métricas)
+        self.cola = eventlet.queue.LightQueue(queue_max)
+        self.pendientes = {}  # url normalizada -> ids de comentarios esperando
+        self._pool = None
+
+    def iniciar(self):
+        if self._pool is None:
+            self._pool = eventlet.GreenPool(self.workers)
+            for _ in range(self.workers):
+                self._pool.spawn_n(self._worker)
+
+    def solicitar(self, url, comentario_id):
+        """Devuelve la preview si está en cache; si no, la encola y devuelve None."""
+        try:
+            key = normalizar_url(url)
+        except ValueError:
+            return None  # URL mal formada (puerto o IPv6 inválidos): sin preview
+        encontrado, preview = self.cache.get(key)
+        if encontrado:
+            return preview
+
+        self.iniciar()
+        if key in self.pendientes:
+            self.pendientes[key].append(comentario_id)
+            return None
+        try:
+            self.cola.put_nowait(key)
+        except eventlet.queue.Full:
+            return None  # cola llena: el comentario se queda sin preview
+        self.pendientes[key] = [comentario_id]
+        return None
+
+    def _worker(self):
+        while True:
+            key = self.cola.get()
+            preview = extract_link_preview(key, self.max_bytes, self.medir)
+            self.cache.set(key, preview)
+            ids = self.pendientes.pop(key, [])
+            if preview is not None:
+                for comentario_id in ids:
+                    self.emitir('preview_comentario', {'id': comentario_id, 'preview': preview})
@@ -0,0 +1,188 @@
+import heapq
+import re
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+from datetime import datetime, timezone
+
+UPSERT = (
+    "INSERT INTO ranking_horas (hora, tipo, clave, nombre, conteo) VALUES (?, ?, ?, ?, 1) "
+    "ON CONFLICT (tipo, clave, hora) DO UPDATE SET conteo = conteo + 1"
+)
+TIPOS = ("cancion", "artista")
+_NO_PALABRA = re.compile(r"[\W_]+")
+
+
+def normalizar(texto):
+    """Clave para agrupar: sin tildes, sin mayúsculas y sin puntuación."""
+    texto = unicodedata.normalize("NFKD", texto or "")
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(_NO_PALABRA.sub(" ", texto.casefold()).split())
+
+
+def hora_de(fecha):
+    # fecha_hora se guarda en UTC sin zona
+    return int(fecha.replace(tzinfo=timezone.utc).timestamp()) // 3600
+
+
+def entradas(cancion, artista):
+    """[(tipo, clave, nombre)] que suma un pedido."""
+    resultado = []
+    clave_artista = normalizar(artista)
+    clave_cancion = normalizar(cancion)
+    if clave_cancion:
+        nombre = f"{cancion.strip()} — {artista.strip()}" if clave_artista else cancion.strip()
+        resultado.append(("cancion", f"{clave_cancion}\x1f{clave_artista}", nombre))
+    if clave_artista:
+        resultado.append(("artista", clave_artista, artista.strip()))
+    return resultado
+
+
+class Ranking:
+    """Canciones y artistas más pedidos en ventanas móviles (última hora, día, semana...).
+
+    Los conteos se guardan por hora en `ranking_horas` (mismo lote que el
+    INSERT del pedido) y en memoria se mantiene, para cada ventana, el total
+    de las horas que entran en ella: al pasar la hora se resta solo lo que
+    sale de la ventana. Así un top-N cuesta lo mismo con 1.000 o con
+    1.000.000 de pedidos en el historial.
+    """
+
+    def __init__(self, ventanas, top=10):
+        self.ventanas = ventanas  # nombre -> horas
+        self.horas_max = max(ventanas.values())
+        self.top_defecto = top  # tamaño del top si no se pide otro
+        self.buckets = OrderedDict()  # hora -> Counter{(tipo, clave): n}, de la más vieja a la más nueva
+        self.totales = {v: {t: Counter() for t in TIPOS} for v in ventanas}
+        self.nombres = {}  # (tipo, clave) -> nombre; queda el primero que se escribió
+        self.hora_actual = None
+        self.version = 0
+        self._cache = {}
+
+    def sentencias(self, cancion, artista, fecha):
+        """Upserts para ranking_horas; van en la misma transacción que el pedido."""
+        hora = hora_de(fecha)
+        return [(UPSERT, (hora, tipo, clave, nombre)) for tipo, clave, nombre in entradas(cancion, artista)]
+
+    def cargar(self, store):
+        with store.lectura() as conn:
+            vacio = conn.execute("SELECT 1 FROM ranking_horas LIMIT 1").fetchone() is None
+            hay_pedidos = conn.execute("SELECT 1 FROM pedidos LIMIT 1").fetchone() is not None
+        if vacio and hay_pedidos:
+            # pedidos anteriores al ranking: se cuentan una sola vez
+            store.mantenimiento(reconstruir)
+
+        ahora = hora_de(datetime.utcnow())
+        with store.lectura() as conn:
+            filas = conn.execute(
+                "SELECT hora, tipo, clave, nombre, conteo FROM ranking_horas WHERE hora > ? ORDER BY hora",
+                (ahora - self.horas_max,)
+            ).fetchall()
+
+        self.buckets = OrderedDict()
+        self.totales = {v: {t: Counter() for t in TIPOS} for v in self.ventanas}
+        self.nombres = {}
+        self.hora_actual = ahora
+        for hora, tipo, clave, nombre, conteo in filas:
+            self._sumar(hora, tipo, clave, conteo)
+            self.nombres.setdefault((tipo, clave), nombre)
+        self._cambio()
+
+    def agregar(self, cancion, artista, fecha):
+        hora = hora_de(fecha)
+        self._avanzar(max(hora, hora_de(datetime.utcnow())))
+        if hora <= self.hora_actual - self.horas_max:
+            return
+        for tipo, clave, nombre in entradas(cancion, artista):
+            self._sumar(hora, tipo, clave, 1)
+            self.nombres.setdefault((tipo, clave), nombre)
+        self._cambio()
+
+    def top(self, ventana, n=None):
+        """{"canciones": [...], "artistas": [...]} con {nombre, conteo}, de mayor a menor."""
+        n = n or self.top_defecto
+        self._avanzar(hora_de(datetime.utcnow()))
+        clave_cache = (ventana, n)
+        if clave_cache not in self._cache:
+            resultado = {}
+            for tipo, nombre_lista in (("cancion", "canciones"), ("artista", "artistas")):
+                mejores = heapq.nlargest(n, self.totales[ventana][tipo].items(), key=lambda kv: (kv[1], kv[0]))
+                resultado[nombre_lista] = [
+                    {"nombre": self.nombres.get((tipo, clave), clave), "conteo": conteo}
+                    for clave, conteo in mejores
+                ]
+            self._cache[clave_cache] = resultado
+        return self._cache[clave_cache]
+
+    def _sumar(self, hora, tipo, clave, conteo):
+        if hora not in self.buckets:
+            tarde = bool(self.buckets) and hora < next(reversed(self.buckets))
+            self.buckets[hora] = Counter()
+            if tarde:
+                # llegó tarde (otro worker): se reordena, pasa pocas veces
+                self.buckets = OrderedDict(sorted(self.buckets.items()))
+        self.buckets[hora][(tipo, clave)] += conteo
+        for ventana, horas in self.ventanas.items():
+            if hora > self.hora_actual - horas:
+                self.totales[ventana][tipo][clave] += conteo
+
+    def _avanzar(self, hora):
+        if self.hora_actual is None:
+            self.hora_actual = hora
+            return
+        if hora <= self.hora_actual:
+            return
+        anterior, self.hora_actual = self.hora_actual, hora
+        cambio = False
+        for ventana, horas in self.ventanas.items():
+            # salen de la ventana las horas en (anterior - horas, hora - horas]
+            for h, conteos in self.buckets.items():
+                if h > hora - horas:
+                    break
+                if h <= anterior - horas:
+                    continue
+                totales = self.totales[ventana]
+                for (tipo, clave), n in conteos.items():
+                    totales[tipo][clave] -= n
+                    if totales[tipo][clave] <= 0:
+                        del totales[tipo][clave]
+                        if horas == self.horas_max:
+                            self.nombres.pop((tipo, clave), None)
+                cambio = True
+        while self.buckets and next(iter(self.buckets)) <= hora - self.horas_max:
+            self.buckets.popitem(last=False)
+        if cambio:
+            self._cambio()
+
+    def _cambio(self):
+        self.version += 1
+        self._cache.clear()
+
+    def stats(self):
+        return {
+            "horas": len(self.buckets),
+            "claves": {v: {t: len(c) for t, c in tipos.items()} for v, tipos in self.totales.items()},
+        }
+
+
+def reconstruir(conn):
+    """Recalcula ranking_horas desde pedidos (para bases anteriores al ranking)."""
+    t0 = time.perf_counter()
+    conteos = Counter()
+    nombres = {}
+    for cancion, artista, fecha_hora in conn.execute("SELECT cancion, artista, fecha_hora FROM pedidos ORDER BY id"):
+        hora = hora_de(datetime.fromisoformat(str(fecha_hora)))
+        for tipo, clave, nombre in entradas(cancion, artista or ""):
+            conteos[(hora, tipo, clave)] += 1
+            nombres.setdefault((hora, tipo, clave), nombre)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.executemany(
+            "INSERT OR REPLACE INTO ranking_horas (hora, tipo, clave, nombre, conteo) VALUES (?, ?, ?, ?, ?)",
+            [(*k, nombres[k], n) for k, n in conteos.items()]
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    print(f"🏆 Ranking reconstruido: {len(conteos)} filas en {time.perf_counter() - t0:.2f}s")
@@ -0,0 +1,115 @@
+"""Servidor SMTP mínimo que acepta todo y no envía nada.
+
+Para probar el envío de correos sin tocar Gmail:
+
+    python smtp_local.py --port 2525
+
+y en la app:
+
+    MAIL_SERVER=127.0.0.1 MAIL_PORT=2525 MAIL_USE_SSL=0
+
+Acepta AUTH PLAIN/LOGIN con cualquier credencial. Con --fallar N las
+primeras N transacciones reciben un 451 (error temporal) para probar los
+reintentos.
+"""
+import argparse
+
+import eventlet
+
+
+class SMTPLocal:
+    def __init__(self, host="127.0.0.1", port=2525, fallar=0, verbose=True):
+        self.host = host
+        self.port = port
+        self.fallar = fallar
+        self.verbose = verbose
+        self.mensajes = []  # (remitente, destinatarios, datos)
+        self.conexiones = 0
+
+    def _atender(self, sock):
+        self.conexiones += 1
+        archivo = sock.makefile("rwb")
+
+        def responder(linea):
+            archivo.write(linea.encode() + b"\r\n")
+            archivo.flush()
+
+        responder("220 smtp-local listo")
+        remitente, destinatarios = None, []
+        try:
+            while True:
+                linea = archivo.readline()
+                if not linea:
+                    break
+                comando = linea.decode(errors="replace").strip()
+                verbo = comando.split(" ", 1)[0].upper()
+
+                if verbo == "EHLO":
+                    archivo.write(b"250-smtp-local\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n")
+                    archivo.flush()
+                elif verbo == "HELO":
+                    responder("250 smtp-local")
+                elif verbo == "AUTH":
+                    partes = comando.split()
+                    if partes[1].upper() == "LOGIN":
+                        for _ in range(2 - (len(partes) > 2)):
+                            responder("334 ")
+                            archivo.readline()
+                    elif len(partes) == 2:
+                        responder("334 ")
+                        archivo.readline()
+                    responder("235 autenticado")
+                elif verbo == "MAIL":
+                    remitente, destinatarios = comando[10:].strip(), []
+                    responder("250 ok")
+                elif verbo == "RCPT":
+                    destinatarios.append(comando[8:].strip())
+                    responder("250 ok")
+                elif verbo == "DATA":
+                    responder("354 terminar con <CRLF>.<CRLF>")
+                    datos = []
+                    while True:
+                        linea = archivo.readline()
+                        if not linea or linea in (b".\r\n", b".\n"):
+                            break
+                        datos.append(linea)
+                    if self.fallar > 0:
+                        self.fallar -= 1
+                        responder("451 error temporal simulado")
+                        continue
+                    self.mensajes.append((remitente, destinatarios, b"".join(datos)))
+                    if self.verbose:
+                        print(f"📨 {remitente} -> {', '.join(destinatarios)}")
+                    responder("250 recibido")
+                elif verbo in ("RSET", "NOOP"):
+                    responder("250 ok")
+                elif verbo == "QUIT":
+                    responder("221 chau")
+                    break
+                else:
+                    responder("502 no implementado")
+        except OSError:
+            pass
+        finally:
+            sock.close()
+
+    def servir(self, listo=None):
+        servidor = eventlet.listen((self.host, self.port))
+        self.port = servidor.getsockname()[1]
+        if listo is not None:
+            listo.send(self.port)
+        pool = eventlet.GreenPool()
+        while True:
+            sock, _ = servidor.accept()
+            pool.spawn_n(self._atender, sock)
+
+
+if __name__ == "__main__":
+    eventlet.monkey_patch()
+    parser = argparse.ArgumentParser(description="Servidor SMTP local de prueba")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2525)
+    parser.add_argument("--fallar", type=int, default=0)
+    args = parser.parse_args()
+    print(f"📮 SMTP local escuchando en {args.host}:{args.port}")
+    SMTPLocal(args.host, args.port, args.fallar).servir()
@@ -0,0 +1,219 @@
+import sqlite3
+import time
+from contextlib import contextmanager
+
+import eventlet
+import eventlet.event
+import eventlet.queue
+from eventlet import tpool
+
+# WAL: los lectores no bloquean al escritor ni al revés.
+# synchronous=NORMAL en WAL solo hace fsync en los checkpoints.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",  # ~16 MB
+    "PRAGMA mmap_size=134217728",  # 128 MB
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+MANTENIMIENTO = "mantenimiento"
+
+
+def operacion(sql):
+    # primera palabra de la sentencia: SELECT, INSERT, PRAGMA...
+    return sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ""
+
+
+class CursorMedido(sqlite3.Cursor):
+    observar = None
+
+    def execute(self, sql, params=()):
+        t0 = time.perf_counter()
+        try:
+            return super().execute(sql, params)
+        finally:
+            self.observar(time.perf_counter() - t0, operacion(sql))
+
+    def executemany(self, sql, params):
+        t0 = time.perf_counter()
+        try:
+            return super().executemany(sql, params)
+        finally:
+            self.observar(time.perf_counter() - t0, operacion(sql))
+
+
+class ConexionMedida(sqlite3.Connection):
+    """Conexión que reporta la duración de cada sentencia a `observar(segundos, operacion)`."""
+
+    observar = None
+
+    def cursor(self, factory=None):
+        cur = super().cursor(factory or CursorMedido)
+        cur.observar = self.observar
+        return cur
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+
+def conectar(path, solo_lectura=False, observar=None):
+    if observar is None:
+        conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    else:
+        conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, factory=ConexionMedida)
+        conn.observar = observar
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    if solo_lectura:
+        conn.execute("PRAGMA query_only=ON")
+    return conn
+
+
+class SQLiteStore:
+    """Un escritor persistente con group commit + pool de lectores.
+
+    Los inserts de greenlets concurrentes se encolan y el escritor los
+    confirma juntos en una sola transacción. Cada llamador espera a que su
+    lote esté confirmado, y se despierta en el mismo orden en que se
+    insertó, así que los emits que hace después conservan el orden.
+    """
+
+    def __init__(self, path, lectores=4, lote_max=64, observar=None, observar_espera=None):
+        self.path = path
+        self.lote_max = lote_max
+        # callbacks de métricas: observar(segundos, operacion) por sentencia,
+        # observar_espera(segundos, "escritura"|"lectura") por llamador
+        self.observar = observar
+        self.observar_espera = observar_espera
+        self.cola = eventlet.queue.LightQueue()
+        self._escritor = None
+        self._conn_escritura = None
+        self._lectores = eventlet.queue.LightQueue()
+        self._n_lectores = lectores
+        self.lotes = 0
+        self.escrituras = 0
+
+    def iniciar(self):
+        if self._escritor is None:
+            self._conn_escritura = conectar(self.path, observar=self.observar)
+            for _ in range(self._n_lectores):
+                self._lectores.put(conectar(self.path, solo_lectura=True, observar=self.observar))
+            self._escritor = eventlet.spawn(self._bucle)
+
+    def insertar(self, sql, params=(), despues=()):
+        """Encola un INSERT y espera a su commit; devuelve el lastrowid.
+
+        `despues` es una lista de (sql, params) que se ejecuta en el mismo
+        savepoint: o entran todas con el INSERT o ninguna.
+        """
+        return self._encolar(sql, params, "lastrowid", despues)
+
+    def ejecutar(self, sql, params=()):
+        """Igual que `insertar` pero devuelve el rowcount (UPDATE/DELETE)."""
+        return self._encolar(sql, params, "rowcount")
+
+    def mantenimiento(self, fn):
+        """Ejecuta `fn(conn)` con la conexión del escritor, fuera de transacción.
+
+        Para cosas como VACUUM o PRAGMAs que no pueden ir dentro de un lote.
+        """
+        return self._encolar(fn, None, MANTENIMIENTO)
+
+    def _encolar(self, sql, params, resultado, despues=()):
+        self.iniciar()
+        evento = eventlet.event.Event()
+        t0 = time.perf_counter()
+        self.cola.put((sql, params, evento, resultado, despues))
+        try:
+            return evento.wait()
+        finally:
+            if self.observar_espera is not None:
+                self.observar_espera(time.perf_counter() - t0, "escritura")
+
+    @contextmanager
+    def lectura(self):
+        self.iniciar()
+        t0 = time.perf_counter()
+        conn = self._lectores.get()
+        if self.observar_espera is not None:
+            self.observar_espera(time.perf_counter() - t0, "lectura")
+        try:
+            yield conn
+        finally:
+            self._lectores.put(conn)
+
+    def _bucle(self):
+        siguiente = None
+        while True:
+            item = siguiente or self.cola.get()
+            siguiente = None
+            if item[3] == MANTENIMIENTO:
+                self._ejecutar_mantenimiento(item)
+                continue
+
+            lote = [item]
+            while len(lote) < self.lote_max:
+                try:
+                    item = self.cola.get_nowait()
+                except eventlet.queue.Empty:
+                    break
+                if item[3] == MANTENIMIENTO:
+                    siguiente = item  # va después del lote, respetando el orden
+                    break
+                lote.append(item)
+            try:
+                # el commit puede hacer I/O: se ejecuta en un hilo real
+                resultados = tpool.execute(self._ejecutar_lote, lote)
+            except Exception as e:
+                for item in lote:
+                    item[2].send_exception(e)
+                continue
+            self.lotes += 1
+            self.escrituras += len(lote)
+            for item, resultado in zip(lote, resultados):
+                if isinstance(resultado, Exception):
+                    item[2].send_exception(resultado)
+                else:
+                    item[2].send(resultado)
+
+    def _ejecutar_mantenimiento(self, item):
+        fn, _, evento, _, _ = item
+        try:
+            evento.send(tpool.execute(fn, self._conn_escritura))
+        except Exception as e:
+            evento.send_exception(e)
+
+    def _ejecutar_lote(self, lote):
+        conn = self._conn_escritura
+        resultados = []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, params, _, resultado, despues in lote:
+                # un insert inválido no tumba al resto del lote
+                conn.execute("SAVEPOINT item")
+                try:
+                    valor = getattr(conn.execute(sql, params), resultado)
+                    for sql_despues, params_despues in despues:
+                        conn.execute(sql_despues, params_despues)
+                    resultados.append(valor)
+                    conn.execute("RELEASE item")
+                except sqlite3.Error as e:
+                    conn.execute("ROLLBACK TO item")
+                    conn.execute("RELEASE item")
+                    resultados.append(e)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return resultados
+
+    def stats(self):
+        return {
+            "lotes": self.lotes,
+            "escrituras": self.escrituras,
+            "pendientes": self.cola.qsize(),
+            "por_lote": round(self.escrituras / self.lotes, 2) if self.lotes else 0.0,
+        }